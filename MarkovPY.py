@@ -1,46 +1,274 @@
 #!c:/Users/LMiguelGJ/Desktop/LotePy/.venv/Scripts/python.exe
-from collections import deque, defaultdict
-import json
+from collections import deque
+from itertools import islice
+import os
+
+import numpy as np
+
+from frequency_index import load_frequency_index
+from storage import load_draw_store, save_npz
+
+# Índice de columna de cada estado en las tablas vectorizadas (bit de paridad)
+STATES = ('Par', 'Impar')
+
+# Versión del formato de snapshot; cambiarla invalida los snapshots existentes
+SNAPSHOT_VERSION = 2
+# Cantidad de sorteos finales guardados para verificar que el historial no cambió
+SNAPSHOT_FINGERPRINT = 16
+
+
+def parity_bits(numbers):
+    """Convierte una secuencia de sorteos en un arreglo 0/1 (0 = Par, 1 = Impar)."""
+    return (np.asarray(numbers, dtype=np.int64) % 2).astype(np.int64)
+
+
+def context_codes(bits, k, start):
+    """
+    Codifica como entero el contexto de longitud k que precede a cada posición
+    i >= start (el estado más antiguo queda en el bit más significativo).
+    """
+    n = len(bits)
+    codes = np.zeros(max(n - start, 0), dtype=np.int64)
+    for j in range(k):
+        codes = (codes << 1) | bits[start - k + j:n - k + j]
+    return codes
+
+
+def decode_context(code, k):
+    """Convierte un código de contexto en la tupla de estados equivalente."""
+    return tuple(STATES[(code >> (k - 1 - j)) & 1] for j in range(k))
+
+
+def run_lengths(bits):
+    """Longitud del patrón consecutivo (estados iguales) que termina en cada posición."""
+    n = len(bits)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    idx = np.arange(n)
+    is_start = np.ones(n, dtype=bool)
+    is_start[1:] = bits[1:] != bits[:-1]
+    run_start = np.maximum.accumulate(np.where(is_start, idx, 0))
+    return idx - run_start + 1
+
 
 class MarkovPredictor:
-    def __init__(self, order=1):
+    def __init__(self, order=1, window=None):
         self.order = order  # Longitud del patrón consecutivo (1, 2, 3, 6, etc.)
-        self.history = deque(maxlen=order)  # Últimas 'order' paridades
+        # Con 'window' solo se cuentan los últimos 'window' sorteos (ver _evict)
+        self.window = window or None
+        self._window = deque()  # Paridades (0/1) dentro de la ventana
+        self._reset()
+        self.draws_seen = 0  # Cantidad de sorteos consumidos (offset para entrenamiento incremental)
+
+    def _reset(self):
+        """Deja los conteos y el contexto vacíos (conserva order, window y draws_seen)."""
+        order = self.order
+        self._window.clear()
+        # Últimas 'order' paridades; con una ventana más corta que order, solo las de la ventana
+        self.history = deque(maxlen=min(order, self.window or order))
         self.counts_runs = {'Par': 0, 'Impar': 0}  # Conteo de patrones consecutivos (solo longitud 'order')
-        # Transiciones por clave exacta de longitud k (1..order): clave -> siguiente estado
-        self.transitions_by_key = {k: defaultdict(lambda: {'Par': 0, 'Impar': 0}) for k in range(1, order + 1)}
+        # Transiciones por clave exacta de longitud k (1..order): arreglo (2**k, 2) indexado
+        # por el código del contexto (ver context_codes) y el siguiente estado (columna de STATES)
+        self.transition_counts = {k: np.zeros((2 ** k, 2), dtype=np.int64) for k in range(1, order + 1)}
         # Qué viene después de un patrón consecutivo de longitud order
         self.after_runs = {
             'Par': {'Par': 0, 'Impar': 0},
             'Impar': {'Par': 0, 'Impar': 0}
         }
+        self._context = 0  # Código de las últimas 'order' paridades (la más reciente en el bit 0)
+        self._run = 0  # Longitud del patrón consecutivo actual, limitada a 'order'
+
+    @property
+    def transitions_by_key(self):
+        """Vista de las transiciones como {k: {clave: {'Par': n, 'Impar': n}}}, solo claves observadas."""
+        view = {}
+        for k, table in self.transition_counts.items():
+            view[k] = {
+                decode_context(int(code), k): {'Par': int(table[code, 0]), 'Impar': int(table[code, 1])}
+                for code in np.flatnonzero(table.sum(axis=1))
+            }
+        return view
 
     def _state(self, number):
         return 'Par' if number % 2 == 0 else 'Impar'
 
+    def _available(self):
+        """Cuántas paridades recientes sirven como contexto (limitado por la ventana)."""
+        if self.window is None:
+            return len(self.history)
+        return min(len(self.history), len(self._window))
+
+    def _evict(self):
+        """
+        Saca de la ventana el sorteo más antiguo y descuenta todo lo que empezaba
+        en él: una transición por cada k y, si correspondía, un patrón consecutivo
+        y lo que vino después. Cuesta O(order).
+        """
+        head = list(islice(self._window, 0, self.order + 1))
+        size = len(self._window)
+        code = 0
+        for k in range(1, min(self.order, size - 1) + 1):
+            code = (code << 1) | head[k - 1]
+            self.transition_counts[k][code, head[k]] -= 1
+        # Con window < order no se llega a contar ningún patrón (history tiene menos de 'order')
+        if self.order <= min(size, self.window) and all(b == head[0] for b in head[:self.order]):
+            run_state = STATES[head[0]]
+            self.counts_runs[run_state] -= 1
+            if self.order < size:
+                self.after_runs[run_state][STATES[head[self.order]]] -= 1
+        self._window.popleft()
+
     def update(self, number):
         """Agrega un nuevo número, contabiliza transiciones por clave y patrones consecutivos."""
         current_state = self._state(number)
+        bit = STATES.index(current_state)
+        available = self._available()
 
         # 1) Contar transiciones desde la clave previa hacia el estado actual
         #    Para cada k, la clave es el último k estados ANTES de agregar el actual
-        for k in range(1, self.order + 1):
-            if len(self.history) >= k:
-                key = tuple(list(self.history)[-k:])
-                self.transitions_by_key[k][key][current_state] += 1
+        for k in range(1, available + 1):
+            self.transition_counts[k][self._context & ((1 << k) - 1), bit] += 1
 
         # Detectar si la ventana anterior tenía order estados iguales (antes de agregar current_state)
-        if len(self.history) == self.order and all(s == self.history[0] for s in self.history):
+        if available == self.order and self._run == self.order:
             run_state = self.history[0]
             self.after_runs[run_state][current_state] += 1
 
         # 2) Agregar el estado actual a la ventana
+        if self.history and self.history[-1] == current_state:
+            self._run = min(self._run + 1, self.order)
+        else:
+            self._run = 1
         self.history.append(current_state)
+        self._context = ((self._context << 1) | bit) & ((1 << self.order) - 1)
 
         # 3) Si la ventana completa (order) es un patrón consecutivo, contar aparición
-        if len(self.history) == self.order and all(s == self.history[0] for s in self.history):
+        if self.window is not None:
+            self._window.append(bit)
+        if self._available() == self.order and self._run == self.order:
             run_state = self.history[0]
             self.counts_runs[run_state] += 1
+        self.draws_seen += 1
+
+        # 4) Con ventana, descontar el sorteo que queda fuera
+        if self.window is not None and len(self._window) > self.window:
+            self._evict()
+
+    def fit(self, numbers):
+        """
+        Entrena en bloque con NumPy. Equivale a llamar update() con cada número
+        en orden, partiendo del estado actual del predictor.
+        """
+        new_bits = parity_bits(numbers)
+        if len(new_bits) == 0:
+            return self
+        if self.window is not None:
+            # Con ventana, el estado equivale a entrenar desde cero con los últimos 'window' sorteos
+            kept = np.concatenate([np.array(self._window, dtype=np.int64), new_bits])[-self.window:]
+            self._reset()
+            self._fit_bits(kept)
+            self._window.extend(int(b) for b in kept)
+        else:
+            self._fit_bits(new_bits)
+        self.draws_seen += len(new_bits)
+        return self
+
+    def _fit_bits(self, new_bits):
+        """Núcleo vectorizado de fit() sobre un arreglo de paridades."""
+        prev_bits = np.array([STATES.index(s) for s in self.history], dtype=np.int64)
+        bits = np.concatenate([prev_bits, new_bits])
+        h, n = len(prev_bits), len(bits)
+
+        # 1) Transiciones por clave exacta de longitud k
+        for k in range(1, self.order + 1):
+            start = max(k, h)
+            if start >= n:
+                continue
+            codes = context_codes(bits, k, start)
+            counts = np.bincount(codes * 2 + bits[start:], minlength=2 ** (k + 1))
+            self.transition_counts[k] += counts.reshape(-1, 2)
+
+        runs = run_lengths(bits)
+
+        # 2) Qué viene después de cada patrón consecutivo de longitud order
+        start = max(h, self.order)
+        if start < n:
+            mask = runs[start - 1:n - 1] >= self.order
+            after = np.bincount(bits[start - 1:n - 1][mask] * 2 + bits[start:][mask], minlength=4)
+            for i, run_state in enumerate(STATES):
+                for j, next_state in enumerate(STATES):
+                    self.after_runs[run_state][next_state] += int(after[i * 2 + j])
+
+        # 3) Apariciones de patrones consecutivos de longitud order
+        start = max(h, self.order - 1)
+        if start < n:
+            ends = bits[start:][runs[start:] >= self.order]
+            counts_runs = np.bincount(ends, minlength=2)
+            for i, state in enumerate(STATES):
+                self.counts_runs[state] += int(counts_runs[i])
+
+        self.history.clear()
+        self.history.extend(STATES[b] for b in bits[-self.order:])
+        self._context = 0
+        for b in bits[-self.order:]:
+            self._context = (self._context << 1) | int(b)
+        self._run = int(min(runs[-1], self.order))
+
+    def save_snapshot(self, path, history):
+        """
+        Guarda el estado del predictor en un archivo .npz versionado.
+        'history' es la secuencia consumida; se guardan sus últimos sorteos
+        para detectar después si el historial fue modificado.
+        """
+        fingerprint = np.asarray(history[max(self.draws_seen - SNAPSHOT_FINGERPRINT, 0):self.draws_seen], dtype=np.int64)
+        arrays = {f"transitions_{k}": table for k, table in self.transition_counts.items()}
+        save_npz(
+            path,
+            version=SNAPSHOT_VERSION,
+            order=self.order,
+            window=self.window or 0,
+            window_bits=np.array(self._window, dtype=np.int64),
+            draws_seen=self.draws_seen,
+            history=np.array([STATES.index(s) for s in self.history], dtype=np.int64),
+            context=self._context,
+            run=self._run,
+            counts_runs=np.array([self.counts_runs[s] for s in STATES], dtype=np.int64),
+            after_runs=np.array([[self.after_runs[r][s] for s in STATES] for r in STATES], dtype=np.int64),
+            fingerprint=fingerprint,
+            **arrays,
+        )
+
+    @classmethod
+    def load_snapshot(cls, path, history=None):
+        """
+        Restaura un predictor desde un snapshot. Si se pasa 'history', retorna
+        None cuando el snapshot no corresponde a un prefijo de ese historial.
+        """
+        with np.load(path) as data:
+            if int(data['version']) != SNAPSHOT_VERSION:
+                return None
+            predictor = cls(order=int(data['order']), window=int(data['window']))
+            draws_seen = int(data['draws_seen'])
+            if history is not None:
+                fingerprint = data['fingerprint']
+                if draws_seen > len(history):
+                    return None
+                start = draws_seen - len(fingerprint)
+                if not np.array_equal(np.asarray(history[start:draws_seen], dtype=np.int64), fingerprint):
+                    return None
+            predictor.draws_seen = draws_seen
+            if predictor.window is not None:
+                predictor._window.extend(int(b) for b in data['window_bits'])
+            predictor.history.extend(STATES[b] for b in data['history'])
+            predictor._context = int(data['context'])
+            predictor._run = int(data['run'])
+            for i, state in enumerate(STATES):
+                predictor.counts_runs[state] = int(data['counts_runs'][i])
+                for j, next_state in enumerate(STATES):
+                    predictor.after_runs[state][next_state] = int(data['after_runs'][i, j])
+            for k in predictor.transition_counts:
+                predictor.transition_counts[k] = data[f"transitions_{k}"].copy()
+        return predictor
 
     def predict_global(self):
         """Predice globalmente usando la frecuencia de patrones consecutivos de longitud 'order'."""
@@ -55,20 +283,17 @@ class MarkovPredictor:
     def predict_with_context(self):
         """Predice siempre con contexto usando back-off de clave exacta de longitud k (order..1)."""
         # Tomar las últimas k paridades como clave y buscar transiciones registradas
-        hist_list = list(self.history)
-        for k in range(self.order, 0, -1):
-            if len(hist_list) >= k:
-                key = tuple(hist_list[-k:])
-                counts = self.transitions_by_key[k].get(key)
-                if counts:
-                    total = counts['Par'] + counts['Impar']
-                    if total > 0:
-                        probs = {
-                            'Par': counts['Par'] / total,
-                            'Impar': counts['Impar'] / total
-                        }
-                        predicted_state = max(probs, key=probs.get)
-                        return k, key, predicted_state, probs
+        for k in range(self._available(), 0, -1):
+            code = self._context & ((1 << k) - 1)
+            par, impar = (int(c) for c in self.transition_counts[k][code])
+            total = par + impar
+            if total > 0:
+                probs = {
+                    'Par': par / total,
+                    'Impar': impar / total
+                }
+                predicted_state = max(probs, key=probs.get)
+                return k, decode_context(code, k), predicted_state, probs
         # Si no hay contexto con datos, caer a la global
         pred_global, probs_global = self.predict_global()
         return 0, tuple(), pred_global, probs_global
@@ -121,6 +346,110 @@ class MarkovPredictor:
             else:
                 return pred_global, probs_global, 'global (por defecto)'
 
+def load_history(path="loteka_numbers.json"):
+    """
+    Carga el historial (con el diario aplicado) como arreglo uint8 de sorteos
+    0-99, descartando valores no válidos. Se lee como np.memmap del archivo
+    binario que acompaña al JSON, sin copiarlo; el JSON solo se recorre (en
+    streaming) si el binario no existe o quedó desfasado.
+    """
+    return load_draw_store(path)
+
+
+def recommend_combined(predictor, weight_context=0.7):
+    """
+    Recomendación final por consenso de los tres métodos combinados.
+    En caso de empate decide el promedio de probabilidades.
+    Retorna (estado, detalle) donde detalle describe cómo se decidió.
+    """
+    pred_weighted, probs_weighted, _ = predictor.predict_combined('weighted', weight_context)
+    pred_conservative, probs_conservative, _ = predictor.predict_combined('conservative')
+    pred_aggressive, probs_aggressive, _ = predictor.predict_combined('aggressive')
+
+    predictions = [pred_weighted, pred_conservative, pred_aggressive]
+    par_count = predictions.count('Par')
+    impar_count = predictions.count('Impar')
+
+    if par_count > impar_count:
+        return 'Par', f"consenso {par_count}/3"
+    if impar_count > par_count:
+        return 'Impar', f"consenso {impar_count}/3"
+
+    # Empate - usar promedio de probabilidades
+    avg_par = (probs_weighted['Par'] + probs_conservative['Par'] + probs_aggressive['Par']) / 3
+    avg_impar = (probs_weighted['Impar'] + probs_conservative['Impar'] + probs_aggressive['Impar']) / 3
+    if avg_par > avg_impar:
+        return 'Par', f"desempate por probabilidad: {avg_par:.1%}"
+    return 'Impar', f"desempate por probabilidad: {avg_impar:.1%}"
+
+
+def summarize(predictor, weight_context=0.7):
+    """Resume en un diccionario todas las predicciones de un predictor entrenado."""
+    pred_global, probs_global = predictor.predict_global()
+    k_used, key_used, pred_ctx, probs_ctx = predictor.predict_with_context()
+    combined, combined_detail = recommend_combined(predictor, weight_context)
+    return {
+        'order': predictor.order,
+        'context': list(predictor.history),
+        'counts_runs': dict(predictor.counts_runs),
+        'global': pred_global,
+        'probs_global': probs_global,
+        'context_prediction': pred_ctx,
+        'probs_context': probs_ctx,
+        'k_used': k_used,
+        'key_used': key_used,
+        'weighted': predictor.predict_combined('weighted', weight_context),
+        'conservative': predictor.predict_combined('conservative'),
+        'aggressive': predictor.predict_combined('aggressive'),
+        'combined': combined,
+        'combined_detail': combined_detail,
+    }
+
+
+def train_incremental(history, order, snapshot_path, window=None):
+    """
+    Entrena un predictor partiendo del snapshot guardado, aplicando solo los
+    sorteos posteriores al offset consumido, y actualiza el snapshot.
+    Si el snapshot no existe o no coincide con el historial, entrena desde cero.
+    """
+    predictor = None
+    if os.path.exists(snapshot_path):
+        try:
+            predictor = MarkovPredictor.load_snapshot(snapshot_path, history)
+        except (OSError, ValueError, KeyError):
+            predictor = None
+        if predictor is not None and (predictor.order, predictor.window) != (order, window or None):
+            predictor = None
+    if predictor is None:
+        predictor = MarkovPredictor(order=order, window=window)
+
+    if predictor.draws_seen < len(history):
+        predictor.fit(history[predictor.draws_seen:])
+        predictor.save_snapshot(snapshot_path, history)
+    elif not os.path.exists(snapshot_path):
+        predictor.save_snapshot(snapshot_path, history)
+    return predictor
+
+
+def analyze_orders(history, orders=range(1, 10), weight_context=0.7, snapshot_dir=None, window=None):
+    """
+    Entrena un predictor por cada orden sobre el mismo historial, convertido
+    a arreglo una sola vez, y retorna {orden: resumen} (ver summarize).
+    Con 'snapshot_dir' cada orden se entrena de forma incremental (ver train_incremental).
+    Con 'window' cada predictor solo considera los últimos 'window' sorteos.
+    """
+    draws = np.asarray(history, dtype=np.int64)
+    suffix = f"_w{window}" if window else ""
+    if snapshot_dir:
+        os.makedirs(snapshot_dir, exist_ok=True)
+        predictors = [
+            train_incremental(draws, order, os.path.join(snapshot_dir, f"markov_order_{order}{suffix}.npz"), window)
+            for order in orders
+        ]
+    else:
+        predictors = [MarkovPredictor(order=order, window=window).fit(draws) for order in orders]
+    return {predictor.order: summarize(predictor, weight_context) for predictor in predictors}
+
 # ------------------------------
 # Ejemplo de uso
 # ------------------------------
@@ -129,14 +458,17 @@ if __name__ == "__main__":
     NUMEROS_A_ANALIZAR = 0
     NUMERO_ORDER = 3
     
-    with open("loteka_numbers.json", "r", encoding="utf-8") as f:
-        raw = json.load(f)
-    historial = []
-    for x in raw:
-        try:
-            historial.append(int(x))
-        except (ValueError, TypeError):
-            pass
+    # Importados aquí porque parity_index, runindex y randomness importan este módulo
+    from parity_index import ParityIndex
+    from randomness import describe_stats, global_significance, proportion_stats, randomness_report
+    from runindex import RunIndex
+
+    historial = load_history("loteka_numbers.json")
+    total_numeros = len(historial)
+    # Índice de frecuencias por número (guardado junto a los datos)
+    frecuencias = load_frequency_index(historial)
+    # Índice de paridades: cualquier rango se consulta sin volver a entrenar
+    paridades = ParityIndex(max_order=NUMERO_ORDER).extend(historial)
     
     # Limitar el historial a los últimos N números si se especifica
     if NUMEROS_A_ANALIZAR > 0 and len(historial) > NUMEROS_A_ANALIZAR:
@@ -145,18 +477,15 @@ if __name__ == "__main__":
     else:
         print(f"Analizando todos los {len(historial)} números del historial")
     
-    predictor = MarkovPredictor(order=NUMERO_ORDER)
-
-    # Inicializamos el modelo con el historial
-    for numero in historial:
-        predictor.update(numero)
+    # Predictor equivalente a MarkovPredictor(NUMERO_ORDER).fit(historial)
+    predictor = paridades.view(NUMERO_ORDER, total_numeros - len(historial))
     
     # Mostrar información sobre el rango analizado
     print(f"\n=== INFORMACIÓN DEL ANÁLISIS ===")
     if NUMEROS_A_ANALIZAR > 0 and len(historial) > 0:
-        print(f"Rango: Desde el número {len(raw) - len(historial) + 1} hasta el {len(raw)}")
+        print(f"Rango: Desde el número {total_numeros - len(historial) + 1} hasta el {total_numeros}")
     
-    print(f"Últimos {NUMERO_ORDER} números analizados: {historial[-NUMERO_ORDER:]}")
+    print(f"Últimos {NUMERO_ORDER} números analizados: {historial[-NUMERO_ORDER:].tolist()}")
 
     # Mostrar la última ventana del deque (contexto actual)
     last_window = list(predictor.history)
@@ -189,8 +518,13 @@ if __name__ == "__main__":
     # Predicciones individuales
     print(f"\n🔮 PREDICCIONES INDIVIDUALES:")
     print(f"   📋 Global: {pred_global} (Par: {probs_global['Par']:.1%}, Impar: {probs_global['Impar']:.1%})")
+    # Los patrones se solapan; la prueba cuenta una vez cada racha del rango analizado
+    rachas = RunIndex().extend(historial)
+    print(f"      🧪 Rachas de {predictor.order}+: {describe_stats(global_significance(rachas, predictor.order))}")
     if k_used > 0:
         print(f"   📋 Contexto: {pred_ctx} (Par: {probs_ctx['Par']:.1%}, Impar: {probs_ctx['Impar']:.1%})")
+        transiciones = paridades.transitions(key_used, predictor.start, predictor.end)
+        print(f"      🧪 {describe_stats(proportion_stats(transiciones['Par'], transiciones['Impar']))}")
     else:
         print(f"   📋 Contexto: Usando predicción global (sin datos de contexto)")
     
@@ -208,6 +542,7 @@ if __name__ == "__main__":
     predictions = [pred_weighted, pred_conservative, pred_aggressive]
     par_count = predictions.count('Par')
     impar_count = predictions.count('Impar')
+    combined, combined_detail = recommend_combined(predictor, 0.7)
     
     print(f"\n{'='*60}")
     print(f"🏆 RECOMENDACIONES FINALES")
@@ -220,18 +555,19 @@ if __name__ == "__main__":
     print(f"   🌍 Global: {pred_global}")
     print(f"   🔍 Contexto: {pred_ctx}")
     
-    if par_count > impar_count:
-        print(f"   🏆 Combinada: PAR (consenso {par_count}/3)")
-    elif impar_count > par_count:
-        print(f"   🏆 Combinada: IMPAR (consenso {impar_count}/3)")
-    else:
-        # Empate - usar promedio de probabilidades
-        avg_par = (probs_weighted['Par'] + probs_conservative['Par'] + probs_aggressive['Par']) / 3
-        avg_impar = (probs_weighted['Impar'] + probs_conservative['Impar'] + probs_aggressive['Impar']) / 3
-        if avg_par > avg_impar:
-            print(f"   🏆 Combinada: PAR (desempate por probabilidad: {avg_par:.1%})")
-        else:
-            print(f"   🏆 Combinada: IMPAR (desempate por probabilidad: {avg_impar:.1%})")
+    print(f"   🏆 Combinada: {combined.upper()} ({combined_detail})")
+    
+    # Pruebas de aleatoriedad sobre el historial completo (en caché por versión)
+    aleatoriedad = randomness_report(frecuencias.draws)
+    print(f"\n🧪 ALEATORIEDAD (historial completo):")
+    print(f"   • Uniformidad 00-99: p={aleatoriedad['uniformity']['p_value']:.3f}")
+    print(f"   • Rachas de paridad: z={aleatoriedad['runs']['z']:.2f}, p={aleatoriedad['runs']['p_value']:.3f}")
+    print(f"   • Correlación serial (Ljung-Box): p={aleatoriedad['serial_numbers']['p_value']:.3f}")
+    
+    print(f"\n🔥 NÚMEROS (últimos 1000 sorteos):")
+    print(f"   • Calientes: {', '.join(f'{n:02d} ({c})' for n, c in frecuencias.hot(5, 1000))}")
+    print(f"   • Fríos: {', '.join(f'{n:02d} ({c})' for n, c in frecuencias.cold(5, 1000))}")
+    print(f"   • Atrasados: {', '.join(f'{n:02d} ({s} sorteos)' for n, s in frecuencias.overdue(5))}")
     
     print(f"{'='*60}")
 
@@ -0,0 +1,141 @@
+"""
+Caché de resultados de análisis compartida por todo el proceso.
+
+Las sesiones de la app (una por navegador) comparten esta caché: un análisis
+se identifica por la versión del historial (largo + hash del final, ver
+storage.dataset_version) y sus parámetros, así que mientras el historial no
+cambie se reutiliza el resultado. Si varias sesiones piden la misma clave a
+la vez, solo una lo calcula y las demás esperan ese resultado. Se conservan
+las últimas claves usadas (LRU) mientras no pasen de MAX_ENTRIES ni de
+MAX_BYTES en total (estimado con sizeof, sobre todo por los arreglos NumPy).
+Al guardar un resultado de una versión nueva del historial se descartan los
+de versiones anteriores, que ya no se van a pedir.
+
+Los valores se comparten entre sesiones: no deben modificarse.
+"""
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+
+from storage import dataset_version
+
+MAX_ENTRIES = 16
+MAX_BYTES = 64 * 1024 * 1024
+
+
+def analysis_key(history, name, **params):
+    """Clave de caché para el análisis 'name' sobre 'history' con 'params' (valores hashables)."""
+    return (dataset_version(history), name, tuple(sorted(params.items())))
+
+
+def sizeof(value, _seen=None):
+    """
+    Tamaño aproximado en bytes de 'value' y lo que contiene (dict, list, tuple,
+    atributos de objetos). Un arreglo NumPy cuenta el buffer que mantiene vivo
+    (el del arreglo base si es una vista); un np.memmap no ocupa memoria propia.
+    """
+    seen = set() if _seen is None else _seen
+    if isinstance(value, np.ndarray):
+        while isinstance(value.base, np.ndarray):
+            value = value.base
+        if id(value) in seen or isinstance(value, np.memmap):
+            return 0
+        seen.add(id(value))
+        return value.nbytes
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(sizeof(k, seen) + sizeof(v, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(sizeof(item, seen) for item in value)
+    elif hasattr(value, '__dict__'):
+        size += sizeof(vars(value), seen)
+    return size
+
+
+def _version(key):
+    """Versión del historial de una clave de analysis_key (None para otras claves)."""
+    return key[0] if isinstance(key, tuple) and key else None
+
+
+class AnalysisCache:
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self.total_bytes = 0
+        self._inflight = {}  # Clave -> Future del cálculo en curso
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def get_or_compute(self, key, compute):
+        """
+        Retorna el valor guardado para 'key' o lo calcula con compute().
+        Si otro hilo ya lo está calculando, espera ese resultado (o su excepción).
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+                self.misses += 1
+            else:
+                self.hits += 1
+        if not owner:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+        size = sizeof(value)
+        with self._lock:
+            version = _version(key)
+            for old in [k for k in self._entries if _version(k) != version]:
+                self._remove(old)
+            # Un valor que no cabe en el límite se retorna sin guardarlo
+            if size <= self.max_bytes:
+                self._entries[key] = value
+                self._sizes[key] = size
+                self.total_bytes += size
+                while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                    self._remove(next(iter(self._entries)))
+            del self._inflight[key]
+        future.set_result(value)
+        return value
+
+    def _remove(self, key):
+        del self._entries[key]
+        self.total_bytes -= self._sizes.pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.total_bytes = 0
+
+
+# Caché única del proceso
+shared_cache = AnalysisCache()
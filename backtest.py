@@ -0,0 +1,233 @@
+#!c:/Users/LMiguelGJ/Desktop/LotePy/.venv/Scripts/python.exe
+"""
+Backtest walk-forward de las predicciones de MarkovPredictor.
+
+Para cada sorteo i se predice con lo aprendido de los sorteos 0..i-1, se
+registra acierto o fallo y luego se "actualiza" con el sorteo i. En lugar de
+llamar predict_*/update 400k veces, los conteos que tendría el predictor en
+cada paso se obtienen con sumas acumuladas, así que una sola pasada vectorizada
+da exactamente las mismas predicciones que el bucle incremental.
+"""
+import numpy as np
+
+from analysis_cache import analysis_key, shared_cache
+from MarkovPY import STATES, context_codes, load_history, parity_bits, run_lengths
+
+METHODS = ('global', 'context', 'weighted', 'conservative', 'aggressive')
+ORDERS = [1, 2, 3, 4, 5, 6, 7, 8, 9]
+
+
+def prior_group_counts(groups, values):
+    """
+    Para cada posición j y cada columna c de 'values', cuántas posiciones
+    anteriores del mismo grupo tienen values[:, c] == 1 (conteo exclusivo).
+    """
+    n = len(groups)
+    if n == 0:
+        return np.zeros((0, values.shape[1]), dtype=np.int64)
+    order = np.argsort(groups, kind='stable')
+    sorted_values = values[order].astype(np.int64)
+    exclusive = np.cumsum(sorted_values, axis=0) - sorted_values
+    sorted_groups = groups[order]
+    group_start = np.ones(n, dtype=bool)
+    group_start[1:] = sorted_groups[1:] != sorted_groups[:-1]
+    start_idx = np.maximum.accumulate(np.where(group_start, np.arange(n), 0))
+    counts = np.empty_like(exclusive)
+    counts[order] = exclusive - exclusive[start_idx]
+    return counts
+
+
+def transition_counts(bits, max_order, window=None):
+    """
+    Para cada k en 1..max_order, los conteos (Par, Impar) que tendría
+    transition_counts[k] del predictor para el contexto vigente antes de cada
+    sorteo i >= k. No dependen del orden, así que se comparten entre órdenes.
+
+    Con 'window' el predictor de cada paso es uno nuevo entrenado solo con los
+    últimos 'window' sorteos (como NUMEROS_A_ANALIZAR): solo cuentan las
+    transiciones cuyo contexto completo cae dentro de esa ventana.
+    """
+    n = len(bits)
+    counts = {}
+    for k in range(1, min(max_order, n - 1) + 1):
+        codes = context_codes(bits, k, k)
+        targets = bits[k:]
+        counts[k] = prior_group_counts(codes, np.stack([targets == 0, targets == 1], axis=1))
+        if window:
+            # Quitar las transiciones con destino j < inicio_ventana + k
+            positions = np.arange(k, n)
+            limit = np.maximum(positions - window, 0) + k
+            for state in range(2):
+                mask = targets == state
+                keys = np.sort(codes[mask] * (n + 1) + positions[mask])
+                base = codes * (n + 1)
+                counts[k][:, state] -= np.searchsorted(keys, base + limit) - np.searchsorted(keys, base)
+    return counts
+
+
+def global_probs(bits, order, window=None):
+    """Probabilidades de predict_global() antes de cada sorteo (arreglos Par, Impar)."""
+    n = len(bits)
+    runs = run_lengths(bits)
+    is_run = runs >= order
+    # counts_runs antes del sorteo i = patrones que terminan en posiciones < i
+    par = np.concatenate([[0], np.cumsum(is_run & (bits == 0))])
+    impar = np.concatenate([[0], np.cumsum(is_run & (bits == 1))])
+    positions = np.arange(n)
+    if window:
+        # Solo patrones completos dentro de la ventana: terminan en j >= inicio + order - 1
+        first = np.minimum(np.maximum(positions - window, 0) + order - 1, positions)
+        par = par[positions] - par[first]
+        impar = impar[positions] - impar[first]
+    else:
+        par, impar = par[:n], impar[:n]
+    total = par + impar
+    safe = np.where(total > 0, total, 1)
+    p_par = np.where(total > 0, par / safe, 0.5)
+    p_impar = np.where(total > 0, impar / safe, 0.5)
+    return p_par, p_impar
+
+
+def context_probs(bits, order, counts=None):
+    """
+    Probabilidades de predict_with_context() antes de cada sorteo, con el mismo
+    back-off (order..1). Retorna (p_par, p_impar, k_usado); k_usado = 0 indica
+    que no hubo contexto con datos y corresponde caer a la global.
+    'counts' puede venir precalculado con transition_counts().
+    """
+    if counts is None:
+        counts = transition_counts(bits, order)
+    n = len(bits)
+    p_par = np.zeros(n)
+    p_impar = np.zeros(n)
+    k_used = np.zeros(n, dtype=np.int64)
+    for k in range(order, 0, -1):
+        if k not in counts:
+            continue
+        par, impar = counts[k][:, 0], counts[k][:, 1]
+        total = par + impar
+        pending = (k_used[k:] == 0) & (total > 0)
+        safe = np.where(total > 0, total, 1)
+        p_par[k:] = np.where(pending, par / safe, p_par[k:])
+        p_impar[k:] = np.where(pending, impar / safe, p_impar[k:])
+        k_used[k:] = np.where(pending, k, k_used[k:])
+    return p_par, p_impar, k_used
+
+
+def method_probs(bits, order, weight_context=0.7, counts=None, window=None):
+    """
+    Probabilidades (Par, Impar) de cada método de METHODS antes de cada sorteo.
+    'weight_context' puede ser una lista; entonces 'weighted' es una lista de
+    pares, uno por peso.
+    """
+    if counts is None:
+        counts = transition_counts(bits, order, window)
+    g_par, g_impar = global_probs(bits, order, window)
+    c_par, c_impar, k_used = context_probs(bits, order, counts)
+    no_context = k_used == 0
+    c_par = np.where(no_context, g_par, c_par)
+    c_impar = np.where(no_context, g_impar, c_impar)
+
+    use_ctx_conservative = np.maximum(c_par, c_impar) >= np.maximum(g_par, g_impar)
+    use_ctx_aggressive = np.minimum(c_par, c_impar) >= np.minimum(g_par, g_impar)
+    weighted = [
+        (w * c_par + (1 - w) * g_par, w * c_impar + (1 - w) * g_impar)
+        for w in np.atleast_1d(weight_context)
+    ]
+    return {
+        'global': (g_par, g_impar),
+        'context': (c_par, c_impar),
+        'weighted': weighted if np.ndim(weight_context) else weighted[0],
+        'conservative': (
+            np.where(use_ctx_conservative, c_par, g_par),
+            np.where(use_ctx_conservative, c_impar, g_impar),
+        ),
+        'aggressive': (
+            np.where(use_ctx_aggressive, c_par, g_par),
+            np.where(use_ctx_aggressive, c_impar, g_impar),
+        ),
+    }
+
+
+def run_backtest(history, orders=ORDERS, methods=METHODS, weight_context=0.7, rolling_window=1000,
+                 window=None, start=0):
+    """
+    Evalúa cada combinación (orden, método) sobre todo el historial.
+    Retorna {(orden, método): resultado} con aciertos, tasa de acierto,
+    precisión móvil (ventana 'rolling_window') y matriz de confusión
+    {predicho: {real: conteo}}.
+
+    'window' limita cada predicción a los últimos N sorteos y 'start' excluye
+    del puntaje los primeros sorteos (por ejemplo, para comparar ventanas).
+    """
+    bits = parity_bits(history)
+    counts = transition_counts(bits, max(orders, default=0), window)
+    results = {}
+    for order in orders:
+        probs = method_probs(bits, order, weight_context, counts, window)
+        for method in methods:
+            p_par, p_impar = probs[method]
+            # max(probs, key=probs.get) elige 'Par' en caso de empate
+            predicted = (p_impar > p_par).astype(np.int64)[start:]
+            actual = bits[start:]
+            n = len(actual)
+            hits = predicted == actual
+            confusion = np.bincount(predicted * 2 + actual, minlength=4)
+            if 0 < rolling_window <= n:
+                cumulative = np.concatenate([[0], np.cumsum(hits)])
+                rolling = (cumulative[rolling_window:] - cumulative[:-rolling_window]) / rolling_window
+            else:
+                rolling = np.zeros(0)
+            results[(order, method)] = {
+                'hits': int(hits.sum()),
+                'total': n,
+                'hit_rate': float(hits.mean()) if n else 0.0,
+                'rolling': rolling,
+                'confusion': {
+                    STATES[p]: {STATES[a]: int(confusion[p * 2 + a]) for a in range(2)}
+                    for p in range(2)
+                },
+            }
+    return results
+
+
+def compact_results(results, keep=1):
+    """
+    Copia de los resultados de run_backtest con solo los últimos 'keep' valores
+    de la precisión móvil. Es lo que se guarda en la caché compartida: la serie
+    completa ocupa un float por sorteo en cada combinación (orden, método).
+    """
+    return {
+        combo: {**result, 'rolling': result['rolling'][-keep:].copy() if keep else np.zeros(0)}
+        for combo, result in results.items()
+    }
+
+
+def main(log=print):
+    """Run the walk-forward backtest and print the combinations ranked by hit rate"""
+    log("🧪 Markov Walk-Forward Backtest")
+
+    history = load_history('loteka_numbers.json')
+    key = analysis_key(history, 'backtest', orders=tuple(ORDERS), methods=METHODS)
+    results = shared_cache.get_or_compute(key, lambda: compact_results(run_backtest(history)))
+    log(f"Draws evaluated: {len(history)}")
+
+    ranked = sorted(results.items(), key=lambda item: item[1]['hit_rate'], reverse=True)
+    log(f"\n{'='*20}")
+    log("📊 HIT RATE BY ORDER / METHOD")
+    log(f"{'='*20}")
+    for (order, method), result in ranked:
+        rolling = result['rolling']
+        last_rolling = f"{rolling[-1]:.1%}" if len(rolling) else "N/A"
+        log(f"Order {order} {method:<12} {result['hit_rate']:.2%}  (last 1000: {last_rolling})")
+
+    (best_order, best_method), best = ranked[0]
+    log(f"\n🏆 Best: order {best_order} {best_method} ({best['hit_rate']:.2%})")
+    for predicted, row in best['confusion'].items():
+        log(f"  Predicted {predicted}: Par {row['Par']}, Impar {row['Impar']}")
+
+    log(f"\n✅ Backtest complete!")
+
+
+if __name__ == "__main__":
+    main()
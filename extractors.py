@@ -0,0 +1,122 @@
+"""
+Extracción de números desde el HTML de getChanceExpress.php.
+
+Cada extractor recibe el HTML y retorna, en orden de documento, el texto del
+primer <span class="numero"> de cada <li>. El extractor por defecto ('stream')
+recorre el HTML con html.parser sin construir el árbol y da el mismo resultado
+que BeautifulSoup; 'lxml' es opcional y 'bs4' queda como respaldo.
+"""
+import os
+from html.parser import HTMLParser
+
+DEFAULT_EXTRACTOR = os.getenv('SCRAPER_EXTRACTOR', 'stream')
+
+# Elementos sin cierre: BeautifulSoup los cierra en cuanto se abren
+VOID_ELEMENTS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen',
+    'link', 'menuitem', 'meta', 'param', 'source', 'track', 'wbr', 'basefont',
+    'bgsound', 'command', 'frame', 'image', 'isindex', 'nextid', 'spacer',
+}
+
+
+class _NumeroParser(HTMLParser):
+    """Sigue solo los <li> abiertos y el primer span.numero de cada uno."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []   # Elementos abiertos: [tag, slot de <li>, buffer de span.numero]
+        self.slots = []   # Por cada <li>, en orden: buffer de su primer span.numero o None
+        self.active = []  # Buffers de los span.numero abiertos
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_ELEMENTS:
+            return
+        slot = buffer = None
+        if tag == 'li':
+            slot = len(self.slots)
+            self.slots.append(None)
+        elif tag == 'span' and any(name == 'class' and value and 'numero' in value.split() for name, value in attrs):
+            buffer = []
+            self.active.append(buffer)
+            # Es el primer span.numero de cada <li> abierto que aún no tenga uno
+            for _, li_slot, _ in self.stack:
+                if li_slot is not None and self.slots[li_slot] is None:
+                    self.slots[li_slot] = buffer
+        self.stack.append([tag, slot, buffer])
+
+    def handle_endtag(self, tag):
+        # Igual que BeautifulSoup: cerrar hasta el último elemento abierto con ese tag
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i][0] == tag:
+                del self.stack[i:]
+                self.active = [buffer for _, _, buffer in self.stack if buffer is not None]
+                return
+
+    def handle_data(self, data):
+        for buffer in self.active:
+            buffer.append(data)
+
+    def numbers(self):
+        return [''.join(buffer).strip() for buffer in self.slots if buffer is not None]
+
+
+def extract_numbers_stream(html):
+    parser = _NumeroParser()
+    parser.feed(html)
+    parser.close()
+    return parser.numbers()
+
+
+def extract_numbers_lxml(html):
+    import lxml.html
+
+    if not html.strip():
+        return []
+    root = lxml.html.fromstring(html)
+    numbers = []
+    for li in root.iter('li'):
+        spans = li.xpath(".//span[contains(concat(' ', normalize-space(@class), ' '), ' numero ')]")
+        if spans:
+            numbers.append(spans[0].text_content().strip())
+    return numbers
+
+
+def extract_numbers_bs4(html):
+    from bs4 import BeautifulSoup
+
+    # Analizar el contenido HTML
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Lista para almacenar los primeros números
+    numbers = []
+
+    # Iterar sobre cada <li> y obtener solo el primer <span class="numero">
+    for li in soup.find_all('li'):
+        first_number_span = li.find('span', class_='numero')
+        if first_number_span:
+            numbers.append(first_number_span.text.strip())
+    return numbers
+
+
+EXTRACTORS = {
+    'stream': extract_numbers_stream,
+    'lxml': extract_numbers_lxml,
+    'bs4': extract_numbers_bs4,
+}
+
+
+def extract_numbers(html, extractor=None):
+    """
+    Extrae los números con el extractor indicado (por defecto SCRAPER_EXTRACTOR);
+    si falla, usa BeautifulSoup. Un nombre desconocido lanza ValueError.
+    """
+    name = extractor or DEFAULT_EXTRACTOR
+    extract = EXTRACTORS.get(name)
+    if extract is None:
+        raise ValueError(f"Extractor desconocido: {name!r} (opciones: {', '.join(EXTRACTORS)})")
+    if extract is extract_numbers_bs4:
+        return extract(html)
+    try:
+        return extract(html)
+    except Exception:
+        return extract_numbers_bs4(html)
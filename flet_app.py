@@ -1,12 +1,25 @@
 #!c:/Users/LMiguelGJ/Desktop/LotePy/.venv/Scripts/python.exe
 import flet as ft
-import subprocess
-import json
 import os
 import threading
 import time
 from datetime import datetime
-import sys
+
+import backtest
+import main_runner
+import randomness
+import scrapy
+from frequency_index import FREQ_FILE, load_frequency_index, refresh_frequency_index, update_frequency_index
+from jobs import CANCELLED, DONE, FAILED, RUNNING, JobManager
+from logsink import MAX_LINES, LogSink
+from storage import file_lock, journal_path, pop_draws, read_tail
+
+# One queue for the whole server: jobs from every browser session run one at a time
+job_manager = JobManager()
+
+# Cache for the "Ultimos" label, invalidated when the data file or its journal changes
+_last_numbers_cache = {'key': None, 'value': None}
+_last_numbers_lock = threading.Lock()
 
 def get_last_6_numbers():
     json_file_path = os.path.join(os.getcwd(), "loteka_numbers.json")
@@ -14,17 +27,54 @@ def get_last_6_numbers():
         return "No data file found."
     
     try:
-        with open(json_file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        stat = os.stat(json_file_path)
+        journal = journal_path(json_file_path)
+        journal_stat = os.stat(journal) if os.path.exists(journal) else None
+        cache_key = (
+            json_file_path, stat.st_mtime_ns, stat.st_size,
+            journal_stat and (journal_stat.st_mtime_ns, journal_stat.st_size),
+        )
+        with _last_numbers_lock:
+            if _last_numbers_cache['key'] == cache_key:
+                return _last_numbers_cache['value']
         
-        if not data or not isinstance(data, list):
-            return "No numbers in data file."
+        last_6 = read_tail(json_file_path, 6)
+        value = ", ".join(map(str, last_6)) if last_6 else "No numbers in data file."
         
-        last_6 = data[-6:]
-        return ", ".join(map(str, last_6))
+        with _last_numbers_lock:
+            _last_numbers_cache['key'] = cache_key
+            _last_numbers_cache['value'] = value
+        return value
     except Exception as e:
         return f"Error reading numbers: {str(e)}"
 
+# Same idea for the hot/overdue label, keyed on the frequency index file
+_hot_numbers_cache = {'key': None, 'value': None}
+
+def get_hot_numbers(window=1000):
+    index_path = os.path.join(os.getcwd(), FREQ_FILE)
+    try:
+        if not os.path.exists(index_path):
+            refresh_frequency_index(os.path.join(os.getcwd(), "loteka_numbers.json"), index_path)
+        stat = os.stat(index_path)
+        cache_key = (index_path, stat.st_mtime_ns, stat.st_size, window)
+        with _last_numbers_lock:
+            if _hot_numbers_cache['key'] == cache_key:
+                return _hot_numbers_cache['value']
+        
+        # Queried from the persisted index, without loading the history
+        index = load_frequency_index(path=index_path)
+        hot = ", ".join(f"{n:02d}" for n, _ in index.hot(5, window))
+        overdue = ", ".join(f"{n:02d}" for n, _ in index.overdue(3))
+        value = f"Hot: {hot} | Overdue: {overdue}"
+        
+        with _last_numbers_lock:
+            _hot_numbers_cache['key'] = cache_key
+            _hot_numbers_cache['value'] = value
+        return value
+    except Exception as e:
+        return f"Error reading index: {str(e)}"
+
 def main(page: ft.Page):
     page.title = "LOTeka Analyzer"
     page.theme_mode = ft.ThemeMode.DARK
@@ -39,21 +89,38 @@ def main(page: ft.Page):
     )
     page.bgcolor = "#0f0f0f"
     
-    # Output control for displaying script results
-    output_text = ft.TextField(
-        multiline=True,
-        read_only=True,
+    # Output control for displaying script results: one Text per line, so each
+    # update only sends the lines appended since the last flush
+    output_list = ft.ListView(
+        expand=True,
+        spacing=0,
+        auto_scroll=True,
+    )
+    output_text = ft.Container(
+        content=output_list,
         expand=True,
-        max_lines=None,
-        text_style=ft.TextStyle(font_family="Consolas", size=13),
-        border_color="#3b3b3b",
+        height=420,
         bgcolor="#1a1a1a",
-        color="#a3e635",
+        border=ft.border.all(1, "#3b3b3b"),
         border_radius=12,
-        focused_border_color="#6366f1",
-        content_padding=15,
+        padding=15,
     )
     
+    def show_lines(lines, dropped):
+        if dropped:
+            del output_list.controls[:dropped]
+        output_list.controls.extend(
+            ft.Text(text, color=color, font_family="Consolas", size=13, selectable=True)
+            for text, color in lines
+        )
+        # Keep the view bounded to the sink's ring buffer
+        if len(output_list.controls) > MAX_LINES:
+            del output_list.controls[:len(output_list.controls) - MAX_LINES]
+        output_list.update()
+    
+    # Lines are batched and flushed at most every ~100 ms
+    log_sink = LogSink(show_lines)
+    
     # Status indicators
     status_dot = ft.Container(
         width=12,
@@ -74,6 +141,12 @@ def main(page: ft.Page):
         size=14,
         weight=ft.FontWeight.W_500,
     )
+    hot_numbers_label = ft.Text(
+        get_hot_numbers(),
+        color="#94a3b8",
+        size=13,
+        weight=ft.FontWeight.W_500,
+    )
     
     status_indicator = ft.Container(
         content=ft.Row([
@@ -107,95 +180,79 @@ def main(page: ft.Page):
         status_dot.bgcolor = dot_colors.get(color, color)
         status_text.value = message
         last_numbers_label.value = f"Ultimos: {get_last_6_numbers()}"
+        hot_numbers_label.value = get_hot_numbers()
         page.update()
     
-    def append_output(text, color="#00ff00"):
+    def append_output(text, color="#a3e635"):
         current_time = datetime.now().strftime("%H:%M:%S")
-        output_text.value += f"[{current_time}] {text}\n"
+        log_sink.write((f"[{current_time}] {text}", color))
+    
+    
+    def on_job_event(event, job, text):
+        # Called from the worker thread for jobs of every session
+        if event == 'log':
+            for line in text.split("\n"):
+                append_output(line.strip())
+            return
+        if job.state == RUNNING:
+            update_status(f"Running {job.name}...", "orange")
+            append_output(f"🚀 Starting {job.name}...", "#ffff00")
+        elif job.state == DONE:
+            update_status(f"{job.name} completed successfully!", "green")
+            append_output(f"✅ {job.name} completed successfully!", "#00ff00")
+        elif job.state == FAILED:
+            update_status(f"{job.name} failed!", "red")
+            append_output(f"❌ Errors:\n{job.error}", "#ff4444")
+        elif job.state == CANCELLED:
+            update_status(f"{job.name} cancelled", "red")
+            append_output(f"⏹️ {job.name} cancelled", "#fbbf24")
+        else:
+            append_output(f"⏳ {job.name} queued", "#94a3b8")
+        progress_bar.visible = job_manager.current() is not None or bool(job_manager.pending())
         page.update()
     
+    unsubscribe = job_manager.subscribe(on_job_event)
     
-    def run_script(script_name, description):
-        def run():
-            try:
-                update_status(f"Running {description}...", "orange")
-                progress_bar.visible = True
-                page.update()
-                
-                append_output(f"🚀 Starting {description}...", "#ffff00")
-                
-                # Run the script
-                process = subprocess.Popen(
-                    [sys.executable, script_name],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True,
-                    bufsize=1,
-                    universal_newlines=True
-                )
-                
-                # Read output in real-time
-                while True:
-                    output = process.stdout.readline()
-                    if output == '' and process.poll() is not None:
-                        break
-                    if output:
-                        append_output(output.strip())
-                
-                # Check for errors
-                stderr = process.stderr.read()
-                if stderr:
-                    append_output(f"❌ Errors:\n{stderr}", "#ff4444")
-                
-                return_code = process.poll()
-                
-                if return_code == 0:
-                    update_status(f"{description} completed successfully!", "green")
-                    append_output(f"✅ {description} completed successfully!", "#00ff00")
-                else:
-                    update_status(f"{description} failed!", "red")
-                    append_output(f"❌ {description} failed with return code {return_code}", "#ff4444")
-                
-            except Exception as e:
-                update_status(f"Error running {description}", "red")
-                append_output(f"❌ Exception: {str(e)}", "#ff4444")
-            finally:
-                progress_bar.visible = False
-                page.update()
-        
-        # Run in separate thread to avoid blocking UI
-        thread = threading.Thread(target=run)
-        thread.start()
+    def on_disconnect(e):
+        unsubscribe()
+        log_sink.close()
+    
+    page.on_disconnect = on_disconnect
+    
+    def run_job(description, func):
+        if any(job.name == description for job in job_manager.pending()):
+            append_output(f"ℹ️ {description} is already queued", "#94a3b8")
+        job_manager.submit(description, func)
+    
+    def cancel_jobs(e):
+        if not job_manager.cancel_all():
+            append_output("ℹ️ No job to cancel.", "#94a3b8")
     
     def clear_output(e):
-        output_text.value = ""
-        page.update()
+        log_sink.clear()
+        output_list.controls.clear()
+        output_list.update()
 
-    def delete_last_number(e):
+    def delete_last_number(log):
+        # Runs as a job so it never overlaps a scraper writing the same file
         json_file_path = os.path.join(os.getcwd(), "loteka_numbers.json")
         if not os.path.exists(json_file_path):
-            append_output("❌ No data file found to delete from.", "#ff4444")
+            log("❌ No data file found to delete from.")
             return
 
         try:
-            # Read and update the JSON file
-            with open(json_file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            if data and isinstance(data, list):
-                removed_number = data.pop()
-                with open(json_file_path, 'w', encoding='utf-8') as f:
-                    json.dump(data, f)
-                append_output(f"🗑️ Removed last number: {removed_number}", "#fbbf24")
+            # Journaled, atomic removal under the same lock the scraper uses
+            with file_lock(json_file_path):
+                removed = pop_draws(1, json_file_path)
+                update_frequency_index(removed=removed, json_path=json_file_path,
+                                       path=os.path.join(os.getcwd(), FREQ_FILE))
+            if removed:
+                log(f"🗑️ Removed last number: {removed[0]}")
             else:
-                append_output("ℹ️ No numbers to remove.", "#94a3b8")
+                log("ℹ️ No numbers to remove.")
 
         except Exception as ex:
-            append_output(f"❌ Error modifying data file: {str(ex)}", "#ff4444")
-
-        # Update the UI
-        last_numbers_label.value = f"Ultimos: {get_last_6_numbers()}"
-        page.update()
+            log(f"❌ Error modifying data file: {str(ex)}")
     
 
     
@@ -214,7 +271,7 @@ def main(page: ft.Page):
                     padding=ft.padding.symmetric(horizontal=16, vertical=16),
                     shape=ft.RoundedRectangleBorder(radius=12),
                 ),
-                on_click=lambda e: run_script('scrapy.py', "Database Update"),
+                on_click=lambda e: run_job("Database Update", lambda log: scrapy.main(log=log)),
                 tooltip="Scrape latest lottery numbers",
             ),
             col={"xs": 12, "sm": 6, "md": 3},
@@ -230,11 +287,59 @@ def main(page: ft.Page):
                     padding=ft.padding.symmetric(horizontal=16, vertical=16),
                     shape=ft.RoundedRectangleBorder(radius=12),
                 ),
-                on_click=lambda e: run_script('main_runner.py', "Markov Analysis"),
+                on_click=lambda e: run_job("Markov Analysis", lambda log: main_runner.main(log=log)),
                 tooltip="Run Markov chain analysis",
             ),
             col={"xs": 12, "sm": 6, "md": 3},
         ),
+        ft.Container(
+            content=ft.ElevatedButton(
+                content=ft.Row([
+                    ft.Icon(ft.icons.QUERY_STATS_ROUNDED, color="white", size=18),
+                    ft.Text("Backtest", color="white", weight=ft.FontWeight.W_600, size=14),
+                ], spacing=8, alignment=ft.MainAxisAlignment.CENTER),
+                style=ft.ButtonStyle(
+                    bgcolor={ft.ControlState.DEFAULT: "#14b8a6", ft.ControlState.HOVERED: "#0d9488"},
+                    padding=ft.padding.symmetric(horizontal=16, vertical=16),
+                    shape=ft.RoundedRectangleBorder(radius=12),
+                ),
+                on_click=lambda e: run_job("Backtest", lambda log: backtest.main(log=log)),
+                tooltip="Walk-forward hit rates per order and method",
+            ),
+            col={"xs": 12, "sm": 6, "md": 3},
+        ),
+        ft.Container(
+            content=ft.ElevatedButton(
+                content=ft.Row([
+                    ft.Icon(ft.icons.SCIENCE_ROUNDED, color="white", size=18),
+                    ft.Text("Randomness", color="white", weight=ft.FontWeight.W_600, size=14),
+                ], spacing=8, alignment=ft.MainAxisAlignment.CENTER),
+                style=ft.ButtonStyle(
+                    bgcolor={ft.ControlState.DEFAULT: "#0ea5e9", ft.ControlState.HOVERED: "#0284c7"},
+                    padding=ft.padding.symmetric(horizontal=16, vertical=16),
+                    shape=ft.RoundedRectangleBorder(radius=12),
+                ),
+                on_click=lambda e: run_job("Randomness Tests", lambda log: randomness.main(log=log)),
+                tooltip="Uniformity, runs and serial-correlation tests with confidence intervals",
+            ),
+            col={"xs": 12, "sm": 6, "md": 3},
+        ),
+        ft.Container(
+            content=ft.ElevatedButton(
+                content=ft.Row([
+                    ft.Icon(ft.icons.STOP_CIRCLE_ROUNDED, color="white", size=18),
+                    ft.Text("Cancel", color="white", weight=ft.FontWeight.W_600, size=14),
+                ], spacing=8, alignment=ft.MainAxisAlignment.CENTER),
+                style=ft.ButtonStyle(
+                    bgcolor={ft.ControlState.DEFAULT: "#f59e0b", ft.ControlState.HOVERED: "#d97706"},
+                    padding=ft.padding.symmetric(horizontal=16, vertical=16),
+                    shape=ft.RoundedRectangleBorder(radius=12),
+                ),
+                on_click=cancel_jobs,
+                tooltip="Cancel the running and queued jobs",
+            ),
+            col={"xs": 12, "sm": 6, "md": 3},
+        ),
         ft.Container(
             content=ft.ElevatedButton(
                 content=ft.Row([
@@ -262,7 +367,7 @@ def main(page: ft.Page):
                     padding=ft.padding.symmetric(horizontal=16, vertical=16),
                     shape=ft.RoundedRectangleBorder(radius=12),
                 ),
-                on_click=delete_last_number,
+                on_click=lambda e: run_job("Delete Last", delete_last_number),
                 tooltip="Remove the last number",
             ),
             col={"xs": 12, "sm": 6, "md": 3},
@@ -284,6 +389,10 @@ def main(page: ft.Page):
                         content=last_numbers_label,
                         col={"xs": 12, "sm": 6, "md": 6},
                     ),
+                    ft.Container(
+                        content=hot_numbers_label,
+                        col={"xs": 12, "sm": 12, "md": 12},
+                    ),
                 ],
                 alignment=ft.MainAxisAlignment.START,
                 vertical_alignment=ft.CrossAxisAlignment.CENTER,
@@ -0,0 +1,274 @@
+"""
+Índice de frecuencias y separaciones por número (00-99).
+
+Mantiene, actualizado sorteo a sorteo:
+
+- counts: cuántas veces salió cada número
+- last_seen: posición de su última aparición (-1 si nunca salió)
+- gap_hist: histograma de separaciones entre apariciones consecutivas de cada
+  número (la última columna acumula las de GAP_BINS - 1 o más) y max_gap
+- prefix: conteos acumulados cada BLOCK sorteos, así los conteos de cualquier
+  rango [inicio, fin) salen de dos filas más a lo sumo 2 * BLOCK sorteos
+
+El índice guarda también los sorteos (un byte cada uno) y se persiste junto
+a los datos (FREQ_FILE), así la app y MarkovPY pueden consultarlo sin volver
+a cargar el JSON. Al agregar o quitar sorteos, update_frequency_index aplica
+solo esos cambios al índice guardado.
+"""
+import os
+
+import numpy as np
+
+from storage import JSON_FILE, coerce_draw, file_lock, load_draw_store, read_tail, save_npz
+
+FREQ_FILE = 'loteka_freq.npz'
+FREQ_VERSION = 1
+NUMBERS = 100
+BLOCK = 64
+GAP_BINS = 1024
+# Sorteos finales del historial que se comparan al actualizar el índice guardado
+FINGERPRINT = 16
+
+
+class FrequencyIndex:
+    def __init__(self):
+        self.counts = np.zeros(NUMBERS, dtype=np.int64)
+        self.last_seen = np.full(NUMBERS, -1, dtype=np.int64)
+        self.gap_hist = np.zeros((NUMBERS, GAP_BINS), dtype=np.int64)
+        self.max_gap = np.zeros(NUMBERS, dtype=np.int64)
+        # Fila b: conteos de los sorteos [0, b * BLOCK); int32 alcanza y ocupa la mitad en disco
+        self.prefix = np.zeros((1, NUMBERS), dtype=np.int32)
+        self._draws = np.zeros(0, dtype=np.uint8)  # Buffer con capacidad de sobra
+        self.draws_seen = 0
+
+    def __len__(self):
+        return self.draws_seen
+
+    @property
+    def draws(self):
+        """Sorteos indexados (vista uint8, sin copia)."""
+        return self._draws[:self.draws_seen]
+
+    def _store(self, new):
+        n = self.draws_seen + len(new)
+        if n > len(self._draws):
+            grown = np.zeros(max(n, 2 * len(self._draws), 1024), dtype=np.uint8)
+            grown[:self.draws_seen] = self.draws
+            self._draws = grown
+        self._draws[self.draws_seen:n] = new
+        self.draws_seen = n
+
+    def extend(self, numbers):
+        """Agrega sorteos (0-99) al final; lanza ValueError si alguno está fuera de rango."""
+        new = np.asarray(numbers, dtype=np.int64).ravel()
+        if len(new) == 0:
+            return self
+        if new.min() < 0 or new.max() >= NUMBERS:
+            raise ValueError("Sorteo fuera de rango 00-99")
+        positions = self.draws_seen + np.arange(len(new))
+
+        # Aparición anterior de cada sorteo: la previa del mismo número en el
+        # bloque nuevo o, para la primera, last_seen
+        order = np.argsort(new, kind='stable')
+        values, positions_sorted = new[order], positions[order]
+        first = np.ones(len(new), dtype=bool)
+        first[1:] = values[1:] != values[:-1]
+        previous = np.empty_like(positions_sorted)
+        previous[1:] = positions_sorted[:-1]
+        previous[first] = self.last_seen[values[first]]
+        seen = previous >= 0
+        gaps = positions_sorted[seen] - previous[seen]
+        np.add.at(self.gap_hist, (values[seen], np.minimum(gaps, GAP_BINS - 1)), 1)
+        np.maximum.at(self.max_gap, values[seen], gaps)
+        last = np.ones(len(new), dtype=bool)
+        last[:-1] = values[:-1] != values[1:]
+        self.last_seen[values[last]] = positions_sorted[last]
+
+        self.counts += np.bincount(new, minlength=NUMBERS)
+        self._store(new)
+        self._extend_prefix()
+        return self
+
+    def _extend_prefix(self):
+        rows = self.draws_seen // BLOCK + 1
+        done = len(self.prefix)
+        if rows <= done:
+            return
+        segment = self.draws[(done - 1) * BLOCK:(rows - 1) * BLOCK].astype(np.int64)
+        blocks = np.arange(len(segment)) // BLOCK
+        per_block = np.bincount(blocks * NUMBERS + segment, minlength=(rows - done) * NUMBERS)
+        new_rows = self.prefix[-1] + np.cumsum(per_block.reshape(rows - done, NUMBERS), axis=0)
+        self.prefix = np.concatenate([self.prefix, new_rows.astype(np.int32)])
+
+    def truncate(self, n=1):
+        """Quita los últimos n sorteos (por ejemplo, tras borrar el último del historial)."""
+        n = min(n, self.draws_seen)
+        for _ in range(n):
+            position = self.draws_seen - 1
+            value = int(self._draws[position])
+            self.draws_seen = position
+            self.counts[value] -= 1
+            earlier = np.flatnonzero(self.draws == value)
+            previous = int(earlier[-1]) if len(earlier) else -1
+            if previous >= 0:
+                gap = position - previous
+                self.gap_hist[value, min(gap, GAP_BINS - 1)] -= 1
+                if gap == self.max_gap[value]:
+                    self.max_gap[value] = int(np.diff(earlier).max(initial=0))
+            self.last_seen[value] = previous
+        self.prefix = self.prefix[:self.draws_seen // BLOCK + 1]
+        return self
+
+    def range_counts(self, start=0, end=None):
+        """Conteo de cada número en los sorteos [start, end); admite índices negativos como slices."""
+        start, end, _ = slice(start, end).indices(self.draws_seen)
+        if end <= start:
+            return np.zeros(NUMBERS, dtype=np.int64)
+        lo, hi = -(-start // BLOCK), end // BLOCK
+        if lo > hi:
+            # Rango dentro de un mismo bloque
+            return np.bincount(self.draws[start:end], minlength=NUMBERS)
+        return (self.prefix[hi] - self.prefix[lo]
+                + np.bincount(self.draws[start:lo * BLOCK], minlength=NUMBERS)
+                + np.bincount(self.draws[hi * BLOCK:end], minlength=NUMBERS))
+
+    def since_last(self):
+        """Sorteos transcurridos desde la última aparición de cada número (draws_seen si nunca salió)."""
+        return np.where(self.last_seen >= 0, self.draws_seen - 1 - self.last_seen, self.draws_seen)
+
+    def mean_gap(self):
+        """Separación media de cada número (las de GAP_BINS - 1 o más cuentan como GAP_BINS - 1)."""
+        total = self.counts - (self.counts > 0)
+        gaps = self.gap_hist @ np.arange(GAP_BINS)
+        return np.where(total > 0, gaps / np.maximum(total, 1), np.nan)
+
+    def hot(self, n=5, window=None):
+        """Los n números más frecuentes (en los últimos 'window' sorteos si se indica), como [(número, veces)]."""
+        counts = self.range_counts(-window if window else 0)
+        top = np.argsort(-counts, kind='stable')[:n]
+        return [(int(number), int(counts[number])) for number in top]
+
+    def cold(self, n=5, window=None):
+        """Los n números menos frecuentes (en los últimos 'window' sorteos si se indica)."""
+        counts = self.range_counts(-window if window else 0)
+        top = np.argsort(counts, kind='stable')[:n]
+        return [(int(number), int(counts[number])) for number in top]
+
+    def overdue(self, n=5):
+        """Los n números que llevan más sorteos sin salir, como [(número, sorteos)]."""
+        since = self.since_last()
+        top = np.argsort(-since, kind='stable')[:n]
+        return [(int(number), int(since[number])) for number in top]
+
+    def save(self, path=FREQ_FILE):
+        save_npz(
+            path,
+            version=FREQ_VERSION,
+            draws=self.draws,
+            counts=self.counts,
+            last_seen=self.last_seen,
+            gap_hist=self.gap_hist,
+            max_gap=self.max_gap,
+            prefix=self.prefix,
+        )
+
+    @classmethod
+    def load(cls, path=FREQ_FILE, history=None):
+        """
+        Restaura el índice guardado. Si se pasa 'history', retorna None cuando
+        los sorteos que tienen en común no coinciden (el índice puede tener
+        sorteos de más si se borraron del final del historial).
+        """
+        with np.load(path) as data:
+            if int(data['version']) != FREQ_VERSION:
+                return None
+            draws = data['draws']
+            # El índice guarda todos sus sorteos, así que se compara el prefijo completo
+            if history is not None:
+                n = min(len(draws), len(history))
+                if not np.array_equal(np.asarray(history[:n], dtype=np.int64), draws[:n]):
+                    return None
+            index = cls()
+            index._draws = draws.astype(np.uint8)
+            index.draws_seen = len(draws)
+            index.counts = data['counts'].copy()
+            index.last_seen = data['last_seen'].copy()
+            index.gap_hist = data['gap_hist'].copy()
+            index.max_gap = data['max_gap'].copy()
+            index.prefix = data['prefix'].astype(np.int32)
+        return index
+
+
+def load_frequency_index(history=None, path=FREQ_FILE, json_path=JSON_FILE):
+    """
+    Carga el índice guardado en 'path'. Con 'history' lo pone al día (agrega
+    los sorteos nuevos, quita los borrados o lo reconstruye si no coincide) y
+    lo vuelve a guardar bajo el bloqueo de 'json_path', el mismo que toman el
+    scraper y la app al modificar el historial; sin 'history' lo retorna tal
+    cual, o None si no existe.
+    """
+    if history is None:
+        return _read_frequency_index(path)
+    with file_lock(json_path):
+        index = _read_frequency_index(path, history) or FrequencyIndex()
+        if index.draws_seen != len(history) or not os.path.exists(path):
+            if index.draws_seen > len(history):
+                index.truncate(index.draws_seen - len(history))
+            index.extend(history[index.draws_seen:])
+            index.save(path)
+        return index
+
+
+def _read_frequency_index(path, history=None):
+    if not os.path.exists(path):
+        return None
+    try:
+        return FrequencyIndex.load(path, history)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def refresh_frequency_index(json_path=JSON_FILE, path=FREQ_FILE):
+    """Pone al día el índice guardado después de modificar el historial."""
+    with file_lock(json_path):
+        return load_frequency_index(load_draw_store(json_path), path, json_path)
+
+
+def _valid_draws(values):
+    """Sorteos válidos de 'values' como enteros; los demás se descartan, como en load_draw_array."""
+    draws = []
+    for value in values:
+        try:
+            draws.append(coerce_draw(value))
+        except ValueError:
+            pass
+    return draws
+
+
+def update_frequency_index(added=(), removed=(), json_path=JSON_FILE, path=FREQ_FILE):
+    """
+    Aplica al índice guardado los sorteos quitados del final del historial
+    ('removed', como los retorna pop_draws) y luego los agregados ('added'),
+    sin volver a leer el historial. Se llama después de modificar el JSON.
+    Si el índice no existe o su final no coincide con el del historial, se
+    reconstruye con refresh_frequency_index.
+    """
+    with file_lock(json_path):
+        index = _read_frequency_index(path)
+        removed, added = _valid_draws(removed), _valid_draws(added)
+        if index is not None and removed:
+            if index.draws[max(len(index) - len(removed), 0):].tolist() != removed:
+                index = None
+            else:
+                index.truncate(len(removed))
+        if index is not None:
+            index.extend(np.asarray(added, dtype=np.int64))
+            tail = _valid_draws(read_tail(json_path, FINGERPRINT))
+            matches = index.draws[max(len(index) - len(tail), 0):].tolist() == tail
+            if not matches or (len(tail) < FINGERPRINT and len(index) != len(tail)):
+                index = None
+        if index is None:
+            return refresh_frequency_index(json_path, path)
+        if added or removed:
+            index.save(path)
+        return index
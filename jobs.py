@@ -0,0 +1,173 @@
+"""
+Cola de trabajos de la interfaz.
+
+Un solo hilo ejecuta los trabajos de a uno y en orden de llegada, así dos
+clics en "Update Database" (o dos sesiones del navegador) nunca corren dos
+scrapers sobre el mismo JSON. Los trabajos corren dentro del proceso, sin
+lanzar otro intérprete, y reciben una función 'log' compatible con print
+para su salida. Esa misma función lanza JobCancelled si el trabajo fue
+cancelado, de modo que se detiene en el siguiente mensaje que escriba.
+"""
+import itertools
+import queue
+import threading
+import time
+import traceback
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+# Trabajos terminados que se conservan para consulta
+MAX_FINISHED = 50
+
+
+class JobCancelled(Exception):
+    """Se lanza desde log() cuando el trabajo en curso fue cancelado."""
+
+
+class Job:
+    def __init__(self, job_id, name, func, key):
+        self.id = job_id
+        self.name = name
+        self.func = func
+        self.key = key  # Trabajos pendientes con la misma clave se unifican
+        self.state = PENDING
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._cancel = threading.Event()
+
+    @property
+    def active(self):
+        return self.state in (PENDING, RUNNING)
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+
+class JobManager:
+    """
+    Ejecuta funciones func(log) en un hilo trabajador único.
+    Los suscriptores reciben listener(evento, trabajo, texto) con evento
+    'state' (cambió job.state) o 'log' (una línea de salida en 'texto').
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._listeners = []
+        self._worker = None
+
+    def subscribe(self, listener):
+        """Registra un suscriptor y retorna la función que lo da de baja."""
+        with self._lock:
+            self._listeners.append(listener)
+
+        def unsubscribe():
+            with self._lock:
+                if listener in self._listeners:
+                    self._listeners.remove(listener)
+        return unsubscribe
+
+    def submit(self, name, func, key=None):
+        """
+        Encola func(log) y retorna su Job. Si ya hay uno pendiente con la misma
+        clave (por defecto, el nombre) se retorna ese en lugar de encolar otro.
+        """
+        key = key or name
+        with self._lock:
+            for job in self._jobs.values():
+                if job.key == key and job.state == PENDING:
+                    return job
+            job = Job(next(self._ids), name, func, key)
+            self._jobs[job.id] = job
+            self._trim()
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='job-worker', daemon=True)
+                self._worker.start()
+        self._queue.put(job)
+        self._emit('state', job)
+        return job
+
+    def cancel(self, job_id):
+        """Cancela un trabajo pendiente o pide detener uno en curso. Retorna False si ya terminó."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or not job.active:
+                return False
+            job._cancel.set()
+            if job.state == PENDING:
+                job.state = CANCELLED
+                job.finished = time.time()
+            changed = job.state == CANCELLED
+        if changed:
+            self._emit('state', job)
+        return True
+
+    def cancel_all(self):
+        """Cancela todos los trabajos activos; retorna cuántos."""
+        return sum(self.cancel(job.id) for job in self.jobs() if job.active)
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def current(self):
+        """El trabajo en curso, o None."""
+        with self._lock:
+            return next((job for job in self._jobs.values() if job.state == RUNNING), None)
+
+    def pending(self):
+        with self._lock:
+            return [job for job in self._jobs.values() if job.state == PENDING]
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+        for job_id in finished[:max(len(finished) - MAX_FINISHED, 0)]:
+            del self._jobs[job_id]
+
+    def _emit(self, event, job, text=None):
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(event, job, text)
+            except Exception:
+                pass  # Una sesión cerrada no debe detener el trabajo
+
+    def _logger(self, job):
+        def log(*args, sep=' ', end='\n', **kwargs):
+            if job.cancel_requested:
+                raise JobCancelled(job.name)
+            self._emit('log', job, sep.join(str(arg) for arg in args))
+        return log
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                if job.state != PENDING:
+                    continue  # Cancelado mientras esperaba
+                job.state = RUNNING
+                job.started = time.time()
+            self._emit('state', job)
+            try:
+                job.result = job.func(self._logger(job))
+                state = DONE
+            except JobCancelled:
+                state = CANCELLED
+            except Exception:
+                job.error = traceback.format_exc()
+                state = FAILED
+            with self._lock:
+                job.state = state
+                job.finished = time.time()
+            self._emit('state', job)
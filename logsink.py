@@ -0,0 +1,75 @@
+"""
+Salida de log por lotes para la interfaz.
+
+Cada línea escrita se guarda en un buffer y se entrega a 'on_flush' en lotes,
+a lo sumo una vez cada 'interval' segundos, en lugar de actualizar la página
+por cada línea. Solo se conservan las últimas 'max_lines' líneas (buffer
+circular), así que una corrida larga del scraper no hace crecer la salida sin
+límite y cada actualización envía solo las líneas nuevas.
+"""
+import threading
+import time
+from collections import deque
+
+FLUSH_INTERVAL = 0.1
+MAX_LINES = 2000
+
+
+class LogSink:
+    def __init__(self, on_flush, max_lines=MAX_LINES, interval=FLUSH_INTERVAL):
+        self.on_flush = on_flush  # on_flush(lineas_nuevas, descartadas)
+        self.max_lines = max_lines
+        self.interval = interval
+        self.lines = deque(maxlen=max_lines)  # Últimas líneas, en orden
+        self._pending = deque(maxlen=max_lines)
+        self._shown = 0  # Líneas entregadas que siguen dentro del buffer circular
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+        self._last_flush = 0.0
+        self._closed = False
+
+    def write(self, line):
+        """Agrega una línea y programa la próxima entrega si no hay una pendiente."""
+        with self._lock:
+            if self._closed:
+                return
+            self.lines.append(line)
+            self._pending.append(line)
+            if self._timer is None:
+                delay = max(self._last_flush + self.interval - time.monotonic(), 0)
+                self._timer = threading.Timer(delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """
+        Entrega las líneas pendientes. 'descartadas' indica cuántas de las ya
+        entregadas salieron del buffer circular y deben quitarse de la vista.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                self._last_flush = time.monotonic()
+                pending = list(self._pending)
+                self._pending.clear()
+                dropped = max(self._shown + len(pending) - self.max_lines, 0)
+                self._shown = min(self._shown + len(pending), self.max_lines)
+            if pending:
+                self.on_flush(pending, min(dropped, self.max_lines))
+
+    def clear(self):
+        with self._lock:
+            self.lines.clear()
+            self._pending.clear()
+            self._shown = 0
+
+    def close(self):
+        """Cancela la entrega pendiente; las líneas siguientes se ignoran."""
+        with self._lock:
+            self._closed = True
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
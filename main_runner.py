@@ -1,88 +1,96 @@
 #!c:/Users/LMiguelGJ/Desktop/LotePy/.venv/Scripts/python.exe
-import subprocess
-import re
-import os
+from analysis_cache import analysis_key, shared_cache
+from MarkovPY import analyze_orders, load_history
+from randomness import global_significance, randomness_report
+from runindex import RUNS_FILE, load_run_index
 
-def get_predictions(order_value):
-    """Get predictions for a specific order value"""
-    # Create temporary file with modified order
-    with open('MarkovPY.py', 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    modified_content = re.sub(r'NUMERO_ORDER = \d+', f'NUMERO_ORDER = {order_value}', content)
-    temp_file = f'temp_order_{order_value}.py'
-    
-    try:
-        with open(temp_file, 'w', encoding='utf-8') as f:
-            f.write(modified_content)
-        
-        # Run analysis
-        result = subprocess.run(['python', temp_file], capture_output=True, text=True, encoding='utf-8')
-        output = result.stdout
-        
-        # Extract predictions
-        return {
-            'global': re.search(r'🌍 Global: (Par|Impar)', output),
-            'context': re.search(r'🔍 Contexto: (Par|Impar)', output),
-            'combined': re.search(r'🏆 Combinada: (PAR|IMPAR)', output)
-        }
-    finally:
-        if os.path.exists(temp_file):
-            os.remove(temp_file)
+ORDERS = [1, 2, 3, 4, 5, 6, 7, 8, 9]
+SNAPSHOT_DIR = 'snapshots'
+
+def compute_analysis(history, orders=ORDERS):
+    """Per-order summaries plus the run-length index (streak counts for every order)"""
+    results = analyze_orders(history, orders, snapshot_dir=SNAPSHOT_DIR)
+    runs = load_run_index(history, RUNS_FILE)
+    return results, runs
 
-def main():
-    """Run analysis for orders 3, 4, 5, 6 with final count summary"""
-    print("🎲 Markov Analysis Runner")
+def main(log=print):
+    """Run analysis for orders 1-9 with final count summary"""
+    log("🎲 Markov Analysis Runner")
     
     # Track predictions
     predictions = {'global': [], 'context': [], 'combined': []}
     
-    for order in [1, 2, 3, 4, 5, 6, 7, 8, 9]:
-        print(f"\n{'='*20}")
-        print(f"Order {order} Analysis")
-        print(f"{'='*20}")
+    # Load the history once and train every order in a single pass; the result is
+    # shared by every session until the dataset changes
+    history = load_history('loteka_numbers.json')
+    key = analysis_key(history, 'main_runner', orders=tuple(ORDERS))
+    results, runs = shared_cache.get_or_compute(key, lambda: compute_analysis(history))
+    report = randomness_report(history)
+    
+    for order in ORDERS:
+        log(f"\n{'='*20}")
+        log(f"Order {order} Analysis")
+        log(f"{'='*20}")
+        
+        result = results[order]
+        global_val, _ = runs.predict_global(order)
+        context_val = result['context_prediction']
+        combined_val = result['combined']
+        
+        log(f"Global: {global_val}")
+        log(f"Context: {context_val}")
+        log(f"Combined: {combined_val}")
+        streaks = runs.counts_runs(order)
+        log(f"Streaks of {order}: Par {streaks['Par']}, Impar {streaks['Impar']}")
+        # Whether each prediction differs from 50/50 (two-sided p-value)
+        global_p = global_significance(runs, order)['p_value']
+        context_stats = report['contexts'].get(result['k_used'], {}).get(result['key_used'])
+        context_p = f"{context_stats['p_value']:.3f}" if context_stats else "N/A"
+        log(f"Significance: global p={global_p:.3f}, context p={context_p}")
         
-        try:
-            preds = get_predictions(order)
-            
-            # Extract values
-            global_val = preds['global'].group(1) if preds['global'] else 'N/A'
-            context_val = preds['context'].group(1) if preds['context'] else 'N/A'
-            combined_val = preds['combined'].group(1).lower().capitalize() if preds['combined'] else 'N/A'
-            
-            print(f"Global: {global_val}")
-            print(f"Context: {context_val}")
-            print(f"Combined: {combined_val}")
-            
-            # Store valid predictions
-            for pred_type, value in [('global', global_val), ('context', context_val), ('combined', combined_val)]:
-                if value in ['Par', 'Impar']:
-                    predictions[pred_type].append(value)
-                    
-        except Exception as e:
-            print(f"Error with order {order}: {e}")
+        # Store valid predictions
+        for pred_type, value in [('global', global_val), ('context', context_val), ('combined', combined_val)]:
+            if value in ['Par', 'Impar']:
+                predictions[pred_type].append(value)
+    
+    # Longest streaks and the one in progress
+    log(f"\n{'='*20}")
+    log("🔥 STREAKS")
+    log(f"{'='*20}")
+    for state, length, start in runs.longest(5):
+        log(f"  {state} x{length} (from draw {start})")
+    state, length = runs.current_run()
+    log(f"  Current: {state} x{length}")
+    
+    # Randomness tests over the whole history
+    log(f"\n{'='*20}")
+    log("🧪 RANDOMNESS")
+    log(f"{'='*20}")
+    log(f"Uniformity 00-99: p={report['uniformity']['p_value']:.3f}")
+    log(f"Parity runs: z={report['runs']['z']:.2f}, p={report['runs']['p_value']:.3f}")
+    log(f"Serial correlation (Ljung-Box): p={report['serial_numbers']['p_value']:.3f}")
     
     # Final count summary
-    print(f"\n{'='*20}")
-    print("📊 FINAL COUNT SUMMARY")
-    print(f"{'='*20}")
+    log(f"\n{'='*20}")
+    log("📊 FINAL COUNT SUMMARY")
+    log(f"{'='*20}")
     
     for pred_type in ['global', 'context', 'combined']:
         par_count = predictions[pred_type].count('Par')
         impar_count = predictions[pred_type].count('Impar')
         label = pred_type.capitalize() + (" Predictions:" if pred_type != 'combined' else " Recommendations:")
-        print(f"\n{label}")
-        print(f"  🟢 Par: {par_count}")
-        print(f"  🔴 Impar: {impar_count}")
+        log(f"\n{label}")
+        log(f"  🟢 Par: {par_count}")
+        log(f"  🔴 Impar: {impar_count}")
     
-    print(f"\n✅ Analysis complete!")
+    log(f"\n✅ Analysis complete!")
     
     # Conteo final total
     total_par = sum(predictions[pred_type].count('Par') for pred_type in ['global', 'context', 'combined'])
     total_impar = sum(predictions[pred_type].count('Impar') for pred_type in ['global', 'context', 'combined'])
-    print(f"\n📈 TOTAL FINAL:")
-    print(f"  🟢 Par: {total_par}")
-    print(f"  🔴 Impar: {total_impar}")
+    log(f"\n📈 TOTAL FINAL:")
+    log(f"  🟢 Par: {total_par}")
+    log(f"  🔴 Impar: {total_impar}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,168 @@
+#!c:/Users/LMiguelGJ/Desktop/LotePy/.venv/Scripts/python.exe
+"""
+Monte Carlo de probabilidad de ruina para la progresión de apuestas.
+
+Se generan muchas secuencias sintéticas de sorteos (uniformes 00-99 o
+remuestreadas del historial real), se juega la progresión de
+simulador_loteria sobre cada una y se estima la probabilidad de bancarrota y
+el retorno esperado. Las secuencias se procesan por lotes vectorizados
+repartidos en un pool de procesos; cada lote usa su propio flujo aleatorio
+derivado de la semilla, así que el resultado no depende de cuántos procesos
+se usen.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from MarkovPY import load_history
+from simulador_loteria import RONDA_MAXIMA, trayectoria_progresion
+
+CHUNK_SIZE = 20000
+# Sorteos simulados por paso antes de descartar las secuencias terminadas
+BLOQUE_SORTEOS = 64
+
+# Paridades del historial para el modo 'bootstrap', cargadas una vez por proceso
+_paridad_historial = None
+
+
+def _iniciar_proceso(paridad):
+    global _paridad_historial
+    _paridad_historial = paridad
+
+
+def _simular_lote(tarea):
+    """
+    Juega un lote de secuencias y retorna sumas parciales para agregar.
+    Avanza por bloques de BLOQUE_SORTEOS sorteos y descarta las secuencias que
+    ya terminaron (bancarrota o límite), que suelen ser la mayoría.
+    """
+    semilla, secuencias, sorteos, capital, eleccion, origen, reiniciar_en_limite = tarea
+    rng = np.random.default_rng(semilla)
+    objetivo = 1 if eleccion == 'IMPAR' else 0
+
+    capital_actual = np.full(secuencias, capital, dtype=np.int64)
+    ronda = np.ones(secuencias, dtype=np.int64)
+    jugados = np.zeros(secuencias, dtype=np.int64)
+    quebrados = 0
+    limitados = 0
+    vivos = np.arange(secuencias)
+
+    for inicio in range(0, sorteos, BLOQUE_SORTEOS):
+        if len(vivos) == 0:
+            break
+        bloque = min(BLOQUE_SORTEOS, sorteos - inicio)
+        if origen == 'bootstrap':
+            paridad = _paridad_historial[rng.integers(0, len(_paridad_historial), size=(len(vivos), bloque))]
+        else:
+            paridad = rng.integers(0, 100, size=(len(vivos), bloque), dtype=np.int64) % 2
+        aciertos = paridad == objetivo
+
+        ronda_bloque, apuesta, neto, acumulado, limite = trayectoria_progresion(
+            aciertos, reiniciar_en_limite, ronda[vivos])
+        sin_fondos = capital_actual[vivos, None] + (acumulado - neto) < apuesta
+        quiebra = np.where(sin_fondos.any(axis=1), sin_fondos.argmax(axis=1), bloque)
+        tope = np.where(limite >= 0, limite + 1, bloque)
+        fin = np.minimum(quiebra, tope)
+
+        filas = np.arange(len(vivos))
+        capital_actual[vivos] += np.where(fin > 0, acumulado[filas, np.maximum(fin - 1, 0)], 0)
+        jugados[vivos] += fin
+        quiebra_bloque = quiebra < tope
+        limite_bloque = (limite >= 0) & (tope <= quiebra)
+        quebrados += int(quiebra_bloque.sum())
+        limitados += int(limite_bloque.sum())
+
+        # Ronda con la que siguen las secuencias que terminaron el bloque
+        siguiente = np.where(aciertos[:, -1], 1, ronda_bloque[:, -1] + 1)
+        if reiniciar_en_limite:
+            siguiente = np.where(siguiente > RONDA_MAXIMA, 1, siguiente)
+        ronda[vivos] = siguiente
+        vivos = vivos[~(quiebra_bloque | limite_bloque)]
+
+    retorno = (capital_actual - capital).astype(np.float64)
+    return {
+        'sequences': secuencias,
+        'bankrupt': quebrados,
+        'limit': limitados,
+        'draws_played': int(jugados.sum()),
+        'return_sum': float(retorno.sum()),
+        'return_sq_sum': float((retorno ** 2).sum()),
+    }
+
+
+def estimate_ruin(capital, sorteos, secuencias, origen='uniform', historial=None, eleccion='PAR',
+                  semilla=0, procesos=None, chunk_size=CHUNK_SIZE, reiniciar_en_limite=False):
+    """
+    Estima la probabilidad de bancarrota y el retorno esperado de jugar la
+    progresión durante 'sorteos' sorteos con capital inicial 'capital'.
+
+    origen: 'uniform' (00-99 equiprobables) o 'bootstrap' (remuestreo de 'historial').
+    procesos: número de procesos (None = todos los núcleos, 1 = en este proceso).
+    El resultado es determinista para una misma semilla y chunk_size.
+    """
+    if origen == 'bootstrap':
+        if historial is None or len(historial) == 0:
+            raise ValueError("El modo 'bootstrap' necesita un historial")
+        paridad = (np.asarray(historial, dtype=np.int64) % 2).astype(np.uint8)
+    elif origen == 'uniform':
+        paridad = None
+    else:
+        raise ValueError(f"Origen desconocido: {origen!r}")
+
+    tamanos = [chunk_size] * (secuencias // chunk_size)
+    if secuencias % chunk_size:
+        tamanos.append(secuencias % chunk_size)
+    semillas = np.random.SeedSequence(semilla).spawn(len(tamanos))
+    tareas = [
+        (s, tamano, sorteos, capital, eleccion.upper(), origen, reiniciar_en_limite)
+        for s, tamano in zip(semillas, tamanos)
+    ]
+
+    if procesos == 1:
+        _iniciar_proceso(paridad)
+        parciales = [_simular_lote(tarea) for tarea in tareas]
+    else:
+        with ProcessPoolExecutor(max_workers=procesos or os.cpu_count(),
+                                 initializer=_iniciar_proceso, initargs=(paridad,)) as pool:
+            parciales = list(pool.map(_simular_lote, tareas))
+
+    if not parciales:
+        return None
+    total = {key: sum(p[key] for p in parciales) for key in parciales[0]}
+    n = total['sequences']
+    media = total['return_sum'] / n
+    varianza = max(total['return_sq_sum'] / n - media ** 2, 0.0)
+    prob_ruina = total['bankrupt'] / n
+    return {
+        'sequences': n,
+        'ruin_probability': prob_ruina,
+        'ruin_std_error': (prob_ruina * (1 - prob_ruina) / n) ** 0.5,
+        'limit_probability': total['limit'] / n,
+        'expected_return': media,
+        'return_std': varianza ** 0.5,
+        'mean_draws_played': total['draws_played'] / n,
+    }
+
+
+def main():
+    """Estimate ruin probability for a small grid of starting capitals"""
+    print("🎲 Monte Carlo Ruin Analysis")
+    historial = load_history('loteka_numbers.json')
+    sorteos = 1000
+    secuencias = 200000
+
+    for origen in ('uniform', 'bootstrap'):
+        print(f"\n{'='*20}")
+        print(f"Source: {origen} ({secuencias} sequences x {sorteos} draws)")
+        print(f"{'='*20}")
+        for capital in (10000, 100000, 1000000, 10000000):
+            r = estimate_ruin(capital, sorteos, secuencias, origen, historial)
+            print(f"Capital {capital:>9}: ruin {r['ruin_probability']:.2%} "
+                  f"(±{r['ruin_std_error']:.2%}), expected return {r['expected_return']:+,.0f}")
+
+    print(f"\n✅ Monte Carlo complete!")
+
+
+if __name__ == "__main__":
+    main()
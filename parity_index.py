@@ -0,0 +1,169 @@
+"""
+Índice acumulado de la secuencia de paridades para consultas por rango.
+
+Para obtener las predicciones de un MarkovPredictor entrenado solo con los
+sorteos [inicio, fin) (como NUMEROS_A_ANALIZAR) no hace falta volver a
+entrenar: con sumas acumuladas de los patrones consecutivos y, para cada k,
+las posiciones de cada (contexto, siguiente) ordenadas por clave, los conteos
+de cualquier rango salen de dos búsquedas por clave.
+
+El índice se construye una vez y se extiende al agregar sorteos; las
+posiciones nuevas quedan en una cola que se revisa directamente hasta que
+supera REINDEX_EVERY y se reordena todo.
+"""
+from collections import deque
+
+import numpy as np
+
+from MarkovPY import STATES, MarkovPredictor, context_codes, decode_context, parity_bits, run_lengths
+
+# Posiciones agregadas que se consultan sin ordenar antes de reordenar el índice
+REINDEX_EVERY = 4096
+
+
+def _reserve(array, n):
+    """Retorna 'array' con capacidad para n filas (duplica el tamaño al crecer)."""
+    if n <= len(array):
+        return array
+    grown = np.zeros((max(n, 2 * len(array), 1024),) + array.shape[1:], dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class ParityIndex:
+    def __init__(self, max_order=9):
+        self.max_order = max_order
+        self.draws_seen = 0
+        self._bits = np.zeros(0, dtype=np.uint8)
+        # Fila j: cuántas posiciones < j cierran un patrón de L iguales, por L-1 y estado
+        self._run_cum = np.zeros((1, max_order, 2), dtype=np.int32)
+        # Por k: clave contexto*2 + siguiente de cada posición (-1 si j < k)
+        self._keys = {k: np.zeros(0, dtype=np.int32) for k in range(1, max_order + 1)}
+        # Por k: posiciones [0, _indexed) ordenadas por clave y el inicio de cada clave
+        self._sorted = {k: np.zeros(0, dtype=np.int64) for k in range(1, max_order + 1)}
+        self._offsets = {k: np.zeros(2 ** (k + 1) + 2, dtype=np.int64) for k in range(1, max_order + 1)}
+        self._indexed = 0
+
+    def __len__(self):
+        return self.draws_seen
+
+    @property
+    def bits(self):
+        return self._bits[:self.draws_seen]
+
+    def extend(self, numbers):
+        """Agrega sorteos al final del índice."""
+        new = parity_bits(numbers)
+        if len(new) == 0:
+            return self
+        n0, n1 = self.draws_seen, self.draws_seen + len(new)
+        self._bits = _reserve(self._bits, n1)
+        self._bits[n0:n1] = new
+        self.draws_seen = n1
+        bits = self.bits.astype(np.int64)
+
+        # Largo del patrón consecutivo en cada posición nueva, limitado a max_order
+        tail_start = max(n0 - self.max_order, 0)
+        runs = np.minimum(run_lengths(bits[tail_start:n1]), self.max_order)[n0 - tail_start:]
+        self._run_cum = _reserve(self._run_cum, n1 + 1)
+        for length in range(1, self.max_order + 1):
+            for state in range(2):
+                closes = (runs >= length) & (new == state)
+                self._run_cum[n0 + 1:n1 + 1, length - 1, state] = (
+                    self._run_cum[n0, length - 1, state] + np.cumsum(closes, dtype=np.int32))
+
+        for k in self._keys:
+            keys = _reserve(self._keys[k], n1)
+            start = max(n0, k)
+            keys[n0:start] = -1
+            if start < n1:
+                keys[start:n1] = context_codes(bits[:n1], k, start) * 2 + bits[start:n1]
+            self._keys[k] = keys
+
+        if n1 - self._indexed > REINDEX_EVERY:
+            self._reindex()
+        return self
+
+    def _reindex(self):
+        n = self.draws_seen
+        for k, keys in self._keys.items():
+            # -1 (sin contexto) queda como 0; con enteros de 16 bits el orden estable es por radix
+            shifted = (keys[:n] + 1).astype(np.min_scalar_type(2 ** (k + 1)))
+            self._sorted[k] = np.argsort(shifted, kind='stable')
+            self._offsets[k] = np.concatenate([[0], np.cumsum(np.bincount(shifted, minlength=2 ** (k + 1) + 1))])
+        self._indexed = n
+
+    def _count(self, k, key, lo, hi):
+        """Posiciones j en [lo, hi) con clave 'key' para el largo k."""
+        if hi <= lo:
+            return 0
+        count = 0
+        if lo < self._indexed:
+            group = self._sorted[k][self._offsets[k][key + 1]:self._offsets[k][key + 2]]
+            bounds = np.searchsorted(group, [lo, min(hi, self._indexed)])
+            count += int(bounds[1] - bounds[0])
+        if hi > self._indexed:
+            count += int(np.count_nonzero(self._keys[k][max(lo, self._indexed):hi] == key))
+        return count
+
+    def _range(self, start, end):
+        start, end, _ = slice(start, end).indices(self.draws_seen)
+        return start, max(end, start)
+
+    def counts_runs(self, order, start=0, end=None):
+        """counts_runs de un MarkovPredictor(order) entrenado solo con los sorteos [start, end)."""
+        start, end = self._range(start, end)
+        lo = start + order - 1
+        if lo >= end:
+            return {state: 0 for state in STATES}
+        diff = self._run_cum[end, order - 1] - self._run_cum[lo, order - 1]
+        return {state: int(diff[i]) for i, state in enumerate(STATES)}
+
+    def transitions(self, key, start=0, end=None):
+        """Transiciones {'Par': n, 'Impar': n} desde el contexto 'key' (tupla de estados) dentro de [start, end)."""
+        start, end = self._range(start, end)
+        k = len(key)
+        code = 0
+        for state in key:
+            code = (code << 1) | STATES.index(state)
+        return {state: self._count(k, code * 2 + i, start + k, end) for i, state in enumerate(STATES)}
+
+    def view(self, order, start=0, end=None):
+        """Predictor de solo lectura equivalente a MarkovPredictor(order).fit(sorteos[start:end])."""
+        if order > self.max_order:
+            raise ValueError(f"El índice llega hasta el orden {self.max_order}")
+        start, end = self._range(start, end)
+        return ParityWindow(self, order, start, end)
+
+
+class ParityWindow:
+    """Consultas de un rango del ParityIndex con la misma interfaz de predicción que MarkovPredictor."""
+
+    predict_global = MarkovPredictor.predict_global
+    predict_combined = MarkovPredictor.predict_combined
+
+    def __init__(self, index, order, start, end):
+        self.index = index
+        self.order = order
+        self.start = start
+        self.end = end
+        self.draws_seen = end - start
+        recent = index.bits[max(start, end - order):end]
+        self.history = deque((STATES[b] for b in recent), maxlen=order)
+        self.counts_runs = index.counts_runs(order, start, end)
+
+    def predict_with_context(self):
+        """Back-off de clave exacta de largo k (order..1), como MarkovPredictor.predict_with_context()."""
+        recent = self.index.bits[self.end - len(self.history):self.end]
+        for k in range(len(self.history), 0, -1):
+            code = 0
+            for b in recent[-k:]:
+                code = (code << 1) | int(b)
+            par = self.index._count(k, code * 2, self.start + k, self.end)
+            impar = self.index._count(k, code * 2 + 1, self.start + k, self.end)
+            total = par + impar
+            if total > 0:
+                probs = {'Par': par / total, 'Impar': impar / total}
+                return k, decode_context(code, k), max(probs, key=probs.get), probs
+        pred_global, probs_global = self.predict_global()
+        return 0, tuple(), pred_global, probs_global
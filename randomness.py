@@ -0,0 +1,421 @@
+#!c:/Users/LMiguelGJ/Desktop/LotePy/.venv/Scripts/python.exe
+"""
+Pruebas de aleatoriedad y significancia sobre el historial.
+
+Sirven para saber si lo que muestran las predicciones (por ejemplo, "Par 51.2%")
+se distingue de 50/50 o es ruido:
+
+- chi-cuadrado de uniformidad de los números 00-99
+- prueba de rachas (Wald-Wolfowitz) sobre la secuencia de paridades
+- correlación serial por desfase (números y paridades) con Ljung-Box
+- intervalos de Wilson y p-valor binomial de cada contexto de transitions_by_key
+
+Todo se calcula sobre el historial completo y sobre ventanas móviles (con
+sumas acumuladas, sin recorrer cada ventana) y el informe se guarda en la
+caché compartida por versión del historial. Los p-valores usan la función
+gamma incompleta regularizada implementada aquí, sin depender de scipy.
+"""
+import math
+
+import numpy as np
+
+from analysis_cache import analysis_key, shared_cache
+from MarkovPY import context_codes, decode_context, load_history, parity_bits
+
+NUMBERS = 100
+WINDOW = 1000
+STEP = 100
+MAX_ORDER = 9
+LAGS = 10
+ALPHA = 0.05
+Z_95 = 1.959963984540054
+
+_EPS = 1e-14
+_TINY = 1e-300
+_MAX_ITER = 1000
+
+
+def gamma_q(a, x):
+    """
+    Función gamma incompleta superior regularizada Q(a, x), vectorizada.
+    Con a = df / 2 y x = estadístico / 2 es la cola de la chi-cuadrado.
+    Serie para x < a + 1 y fracción continua (Lentz) en el resto.
+    """
+    a, x = np.broadcast_arrays(np.asarray(a, dtype=np.float64), np.asarray(x, dtype=np.float64))
+    q = np.ones(a.shape)
+    series = (x > 0) & (x < a + 1)
+    fraction = x >= a + 1
+    if series.any():
+        q[series] = 1 - _gamma_p_series(a[series], x[series])
+    if fraction.any():
+        q[fraction] = _gamma_q_fraction(a[fraction], x[fraction])
+    return np.clip(q, 0.0, 1.0)
+
+
+def _log_prefactor(a, x):
+    return -x + a * np.log(x) - np.vectorize(math.lgamma, otypes=[np.float64])(a)
+
+
+def _gamma_p_series(a, x):
+    ap = a.copy()
+    term = 1 / a
+    total = term.copy()
+    for _ in range(_MAX_ITER):
+        ap += 1
+        term *= x / ap
+        total += term
+        if np.all(np.abs(term) < np.abs(total) * _EPS):
+            break
+    return total * np.exp(_log_prefactor(a, x))
+
+
+def _gamma_q_fraction(a, x):
+    b = x + 1 - a
+    c = np.full(a.shape, 1 / _TINY)
+    d = 1 / b
+    h = d.copy()
+    for i in range(1, _MAX_ITER + 1):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = np.where(np.abs(d) < _TINY, _TINY, d)
+        c = b + an / c
+        c = np.where(np.abs(c) < _TINY, _TINY, c)
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if np.all(np.abs(delta - 1) < _EPS):
+            break
+    return np.exp(_log_prefactor(a, x)) * h
+
+
+def chi2_sf(statistic, df):
+    """P(X >= statistic) para X chi-cuadrado con 'df' grados de libertad."""
+    return gamma_q(np.asarray(df) / 2, np.asarray(statistic) / 2)
+
+
+def normal_sf_two_sided(z):
+    """P(|Z| >= |z|) para Z normal estándar (z^2 es chi-cuadrado con 1 grado)."""
+    return chi2_sf(np.square(z), 1)
+
+
+def _safe_div(num, den):
+    den = np.asarray(den, dtype=np.float64)
+    return np.where(den > 0, num / np.where(den > 0, den, 1), 0.0)
+
+
+def chi_square_uniformity(counts):
+    """
+    Chi-cuadrado de bondad de ajuste a la uniforme 00-99.
+    'counts' es (..., 100); retorna (estadístico, p_valor) con la misma forma sin el último eje.
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    expected = counts.sum(axis=-1, keepdims=True) / counts.shape[-1]
+    statistic = _safe_div((counts - expected) ** 2, expected).sum(axis=-1)
+    return statistic, chi2_sf(statistic, counts.shape[-1] - 1)
+
+
+def runs_z(n, ones, runs):
+    """
+    Prueba de rachas de Wald-Wolfowitz a partir de n, cuántos 1 (Impar) y
+    cuántas rachas hay. Retorna (z, p_valor); z > 0 indica más alternancia de
+    la esperada y z < 0 rachas más largas. Vectorizada.
+    """
+    n = np.asarray(n, dtype=np.float64)
+    ones = np.asarray(ones, dtype=np.float64)
+    zeros = n - ones
+    product = 2 * zeros * ones
+    mean = _safe_div(product, n) + 1
+    variance = _safe_div(product * (product - n), n * n * (n - 1))
+    z = _safe_div(runs - mean, np.sqrt(np.maximum(variance, 0)))
+    return z, normal_sf_two_sided(z)
+
+
+def runs_test(bits):
+    """Prueba de rachas sobre una secuencia de paridades (0 = Par, 1 = Impar)."""
+    bits = np.asarray(bits)
+    if len(bits) == 0:
+        return {'runs': 0, 'expected': 0.0, 'z': 0.0, 'p_value': 1.0}
+    runs = 1 + int(np.count_nonzero(bits[1:] != bits[:-1]))
+    n, ones = len(bits), int(bits.sum())
+    z, p_value = runs_z(n, ones, runs)
+    return {
+        'runs': runs,
+        'expected': 2 * ones * (n - ones) / n + 1,
+        'z': float(z),
+        'p_value': float(p_value),
+    }
+
+
+def serial_correlation(values, lags=LAGS):
+    """
+    Autocorrelación para los desfases 1..lags, con su p-valor (aproximación
+    normal, r * sqrt(n)) y la prueba conjunta de Ljung-Box.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    n = len(x)
+    lags = min(lags, n - 1)
+    if lags < 1:
+        return {'lags': [], 'r': [], 'p_values': [], 'ljung_box': 0.0, 'p_value': 1.0}
+    centered = x - x.mean()
+    variance = centered @ centered
+    r = np.array([_safe_div(centered[:-k] @ centered[k:], variance) for k in range(1, lags + 1)])
+    p_values = normal_sf_two_sided(r * math.sqrt(n))
+    ljung_box = n * (n + 2) * np.sum(r ** 2 / (n - np.arange(1, lags + 1)))
+    return {
+        'lags': list(range(1, lags + 1)),
+        'r': r.tolist(),
+        'p_values': p_values.tolist(),
+        'ljung_box': float(ljung_box),
+        'p_value': float(chi2_sf(ljung_box, lags)),
+    }
+
+
+def wilson_interval(successes, n, z=Z_95):
+    """Intervalo de Wilson para la proporción successes / n (vectorizado). Con n = 0 retorna (0, 1)."""
+    successes = np.asarray(successes, dtype=np.float64)
+    n = np.asarray(n, dtype=np.float64)
+    p = _safe_div(successes, n)
+    z2n = _safe_div(z * z, n)
+    center = (p + z2n / 2) / (1 + z2n)
+    half = z / (1 + z2n) * np.sqrt(_safe_div(p * (1 - p), n) + _safe_div(z * z, 4 * n * n))
+    low = np.where(n > 0, center - half, 0.0)
+    high = np.where(n > 0, center + half, 1.0)
+    return np.clip(low, 0.0, 1.0), np.clip(high, 0.0, 1.0)
+
+
+def binomial_p_value(successes, n):
+    """P-valor bilateral de successes / n contra 50/50 (aproximación normal; 1 con n = 0)."""
+    n = np.asarray(n, dtype=np.float64)
+    return normal_sf_two_sided(_safe_div(np.asarray(successes) - n / 2, np.sqrt(n / 4)))
+
+
+def proportion_stats(par, impar, z=Z_95):
+    """Resultado con el formato de context_significance para unos conteos Par/Impar sueltos."""
+    n = par + impar
+    low, high = wilson_interval(par, n, z)
+    return {
+        'n': int(n),
+        'p_par': par / n if n else 0.5,
+        'low': float(low),
+        'high': float(high),
+        'p_value': float(binomial_p_value(par, n)),
+    }
+
+
+def run_share_stats(long_runs, all_runs, z=Z_95):
+    """
+    Como proportion_stats para las rachas largas de RunIndex.run_counts(L),
+    con 'all_runs' = run_counts(1). Con sorteos al azar el largo de una racha
+    no depende de su estado, así que, dado cuántas rachas llegaron a L, las de
+    Par siguen una hipergeométrica sobre todas las rachas; el p-valor usa esa
+    varianza (contra 50/50 binomial sería conservador para L chico).
+    """
+    stats = proportion_stats(long_runs['Par'], long_runs['Impar'], z)
+    n, total = stats['n'], sum(all_runs.values())
+    if n and total > 1:
+        share = all_runs['Par'] / total
+        variance = n * share * (1 - share) * (total - n) / (total - 1)
+        z_score = _safe_div(long_runs['Par'] - n * share, np.sqrt(variance))
+        stats['p_value'] = float(normal_sf_two_sided(z_score))
+    return stats
+
+
+def global_significance(runs, order, z=Z_95):
+    """
+    Significancia de predict_global() de orden 'order' a partir de un
+    RunIndex. Los counts_runs se solapan (una racha de largo r aporta
+    r - order + 1) y no son ensayos independientes, así que se prueba una
+    racha por ensayo (run_share_stats); con order 1 cada sorteo es un ensayo.
+    """
+    if order <= 1:
+        counts = runs.counts_runs(1)
+        return proportion_stats(counts['Par'], counts['Impar'], z)
+    return run_share_stats(runs.run_counts(order), runs.run_counts(1), z)
+
+
+def context_significance(transition_counts, z=Z_95):
+    """
+    Para cada tabla transition_counts[k] (2^k x 2, columnas Par/Impar, como las
+    de MarkovPredictor) retorna {k: {clave: resultado}} con las mismas claves
+    que transitions_by_key: 'n', 'p_par', intervalo de Wilson de P(Par)
+    ('low', 'high') y 'p_value' de la prueba binomial contra 50/50
+    (aproximación normal).
+    """
+    result = {}
+    for k, table in transition_counts.items():
+        table = np.asarray(table)
+        observed = np.flatnonzero(table.sum(axis=1))
+        par = table[observed, 0].astype(np.float64)
+        n = par + table[observed, 1]
+        low, high = wilson_interval(par, n, z)
+        p_values = binomial_p_value(par, n)
+        result[k] = {
+            decode_context(int(code), k): {
+                'n': int(n[i]),
+                'p_par': float(par[i] / n[i]),
+                'low': float(low[i]),
+                'high': float(high[i]),
+                'p_value': float(p_values[i]),
+            }
+            for i, code in enumerate(observed)
+        }
+    return result
+
+
+def transition_tables(bits, max_order=MAX_ORDER):
+    """Las tablas transition_counts[k] que tendría MarkovPredictor entrenado con todas las paridades."""
+    bits = np.asarray(bits, dtype=np.int64)
+    tables = {}
+    for k in range(1, max_order + 1):
+        keys = context_codes(bits, k, k) * 2 + bits[k:] if len(bits) > k else np.zeros(0, dtype=np.int64)
+        tables[k] = np.bincount(keys, minlength=2 ** (k + 1)).reshape(2 ** k, 2)
+    return tables
+
+
+def rolling_tests(draws, window=WINDOW, step=STEP):
+    """
+    Pruebas sobre las ventanas [s, s + window) con s = 0, step, 2*step, ...
+    ('window' debe ser múltiplo de 'step'). Retorna arreglos por ventana:
+    'start', p-valor de chi-cuadrado, z y p-valor de rachas, autocorrelación
+    de desfase 1 de los números y su p-valor.
+    """
+    if window % step:
+        raise ValueError("window debe ser múltiplo de step")
+    draws = np.asarray(draws, dtype=np.int64)
+    n = len(draws)
+    blocks = n // step
+    per_window = window // step
+    count = blocks - per_window + 1
+    if count <= 0:
+        empty = np.zeros(0)
+        return {'start': empty.astype(np.int64), 'chi2_p': empty, 'runs_z': empty, 'runs_p': empty,
+                'r1': empty, 'r1_p': empty}
+    starts = np.arange(count) * step
+    ends = starts + window
+
+    # Conteos por número de cada bloque de 'step' sorteos, acumulados
+    used = draws[:blocks * step]
+    block_counts = np.bincount(np.arange(len(used)) // step * NUMBERS + used, minlength=blocks * NUMBERS)
+    cumulative = np.zeros((blocks + 1, NUMBERS), dtype=np.int64)
+    np.cumsum(block_counts.reshape(blocks, NUMBERS), axis=0, out=cumulative[1:])
+    _, chi2_p = chi_square_uniformity(cumulative[per_window:per_window + count] - cumulative[:count])
+
+    def prefix(values):
+        return np.concatenate([[0], np.cumsum(values)])
+
+    bits = draws % 2
+    ones = prefix(bits)
+    changes = prefix(np.concatenate([[0], bits[1:] != bits[:-1]]))
+    # Rachas en [s, e) = 1 + cambios en las posiciones s+1..e-1
+    z, runs_p = runs_z(window, ones[ends] - ones[starts], 1 + changes[ends] - changes[starts + 1])
+
+    x = draws.astype(np.float64)
+    sx, sxx = prefix(x), prefix(x * x)
+    sxy = prefix(np.concatenate([x[:-1] * x[1:], [0.0]]))
+    total = sx[ends] - sx[starts]
+    mean = total / window
+    head = total - x[ends - 1]  # x_s .. x_{e-2}
+    tail = total - x[starts]    # x_{s+1} .. x_{e-1}
+    numerator = (sxy[ends - 1] - sxy[starts]) - mean * (head + tail) + (window - 1) * mean ** 2
+    denominator = (sxx[ends] - sxx[starts]) - window * mean ** 2
+    r1 = _safe_div(numerator, denominator)
+    return {
+        'start': starts,
+        'chi2_p': chi2_p,
+        'runs_z': z,
+        'runs_p': runs_p,
+        'r1': r1,
+        'r1_p': normal_sf_two_sided(r1 * math.sqrt(window)),
+    }
+
+
+def randomness_tests(history, window=WINDOW, step=STEP, max_order=MAX_ORDER, lags=LAGS):
+    """Informe completo: pruebas sobre todo el historial, por ventanas y por contexto."""
+    draws = np.asarray(history, dtype=np.int64)
+    bits = parity_bits(draws)
+    statistic, p_value = chi_square_uniformity(np.bincount(draws, minlength=NUMBERS))
+    rolling = rolling_tests(draws, window, step)
+    return {
+        'draws': len(draws),
+        'uniformity': {'chi2': float(statistic), 'df': NUMBERS - 1, 'p_value': float(p_value)},
+        'runs': runs_test(bits),
+        'serial_numbers': serial_correlation(draws, lags),
+        'serial_parity': serial_correlation(bits, lags),
+        'contexts': context_significance(transition_tables(bits, max_order)),
+        'rolling': rolling,
+        # Fracción de ventanas con p < ALPHA; con datos aleatorios ronda ALPHA
+        'rolling_rejections': {
+            test: float(np.mean(rolling[test] < ALPHA)) if len(rolling['start']) else 0.0
+            for test in ('chi2_p', 'runs_p', 'r1_p')
+        },
+    }
+
+
+def randomness_report(history, window=WINDOW, step=STEP, max_order=MAX_ORDER, lags=LAGS):
+    """randomness_tests() guardado en la caché compartida por versión del historial."""
+    key = analysis_key(history, 'randomness', window=window, step=step, max_order=max_order, lags=lags)
+    return shared_cache.get_or_compute(key, lambda: randomness_tests(history, window, step, max_order, lags))
+
+
+def describe_context(report, key):
+    """Texto con el intervalo de P(Par) y el p-valor del contexto 'key' (tupla de estados) del informe."""
+    stats = report['contexts'].get(len(key), {}).get(tuple(key))
+    if not key or stats is None:
+        return "sin contexto"
+    return describe_stats(stats)
+
+
+def describe_stats(stats):
+    """Texto de un resultado de proportion_stats / context_significance."""
+    if stats['n'] == 0:
+        return "sin datos"
+    verdict = "significativo" if stats['p_value'] < ALPHA else "no distinto de 50/50"
+    return (f"Par {stats['p_par']:.1%} [IC95 {stats['low']:.1%}-{stats['high']:.1%}], "
+            f"n={stats['n']}, p={stats['p_value']:.3f} ({verdict})")
+
+
+def main(log=print):
+    """Run the randomness and significance tests and print the report"""
+    log("🧪 Randomness Tests")
+
+    history = load_history('loteka_numbers.json')
+    report = randomness_report(history)
+    log(f"Draws analyzed: {report['draws']}")
+
+    log(f"\n{'='*20}")
+    log("📊 FULL HISTORY")
+    log(f"{'='*20}")
+    uniformity = report['uniformity']
+    log(f"Uniformity 00-99: chi2={uniformity['chi2']:.1f} (df {uniformity['df']}), p={uniformity['p_value']:.3f}")
+    runs = report['runs']
+    log(f"Parity runs: {runs['runs']} (expected {runs['expected']:.0f}), z={runs['z']:.2f}, p={runs['p_value']:.3f}")
+    for label, serial in (('Numbers', report['serial_numbers']), ('Parity', report['serial_parity'])):
+        if serial['lags']:
+            log(f"{label} serial r1={serial['r'][0]:+.4f} (p={serial['p_values'][0]:.3f}), "
+                f"Ljung-Box({len(serial['lags'])})={serial['ljung_box']:.1f}, p={serial['p_value']:.3f}")
+
+    log(f"\n{'='*20}")
+    log(f"📈 ROLLING WINDOWS ({WINDOW} draws, step {STEP})")
+    log(f"{'='*20}")
+    log(f"Windows: {len(report['rolling']['start'])} (about {ALPHA:.0%} should reject by chance)")
+    for test, label in (('chi2_p', 'Uniformity'), ('runs_p', 'Parity runs'), ('r1_p', 'Serial r1')):
+        log(f"{label}: {report['rolling_rejections'][test]:.1%} of windows with p < {ALPHA}")
+
+    log(f"\n{'='*20}")
+    log("🔍 CONTEXTS (P(Par), 95% Wilson CI)")
+    log(f"{'='*20}")
+    significant = [
+        (stats['p_value'], key) for contexts in report['contexts'].values()
+        for key, stats in contexts.items() if stats['p_value'] < ALPHA
+    ]
+    total = sum(len(contexts) for contexts in report['contexts'].values())
+    log(f"Contexts with p < {ALPHA}: {len(significant)}/{total}")
+    for _, key in sorted(significant)[:10]:
+        log(f"  {' '.join(key)}: {describe_context(report, key)}")
+
+    log(f"\n✅ Tests complete!")
+
+
+if __name__ == "__main__":
+    main()
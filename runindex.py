@@ -0,0 +1,211 @@
+"""
+Índice de rachas (run-length) de la secuencia de paridades.
+
+La secuencia Par/Impar se guarda codificada como rachas: un arreglo con el
+estado de cada racha y otro con su largo. Con eso se responden, para cualquier
+largo L y sin reentrenar un MarkovPredictor de orden L:
+
+- counts_runs(L) y after_runs(L): los mismos conteos que tendría el predictor
+- run_counts(L): rachas cerradas de largo >= L, una por racha
+- histogram(): cuántas rachas hubo de cada largo
+- longest(): las rachas más largas y dónde empezaron
+
+El índice se guarda junto a los datos (RUNS_FILE) y se extiende solo con los
+sorteos nuevos; agregar un sorteo a la racha abierta cuesta O(1).
+"""
+import os
+
+import numpy as np
+
+from MarkovPY import SNAPSHOT_FINGERPRINT, STATES, parity_bits
+from storage import save_npz
+
+RUNS_FILE = 'loteka_runs.npz'
+RUNS_VERSION = 1
+
+
+class RunIndex:
+    def __init__(self):
+        self.states = np.zeros(0, dtype=np.uint8)    # Estado (columna de STATES) de cada racha
+        self.lengths = np.zeros(0, dtype=np.int64)   # Largo de cada racha
+        self.draws_seen = 0
+        self._closed = None  # Sumas por estado de las rachas cerradas (ver _closed_stats)
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def extend(self, numbers):
+        """Agrega sorteos al final; la primera racha nueva se une a la abierta si es del mismo estado."""
+        bits = parity_bits(numbers)
+        if len(bits) == 0:
+            return self
+        self.draws_seen += len(bits)
+        if len(self.lengths) and len(bits) == 1 and self.states[-1] == bits[0]:
+            self.lengths[-1] += 1
+            return self
+        starts = np.concatenate([[0], np.flatnonzero(bits[1:] != bits[:-1]) + 1])
+        lengths = np.diff(np.append(starts, len(bits)))
+        states = bits[starts].astype(np.uint8)
+        if len(self.lengths) and self.states[-1] == states[0]:
+            self.lengths[-1] += lengths[0]
+            states, lengths = states[1:], lengths[1:]
+        if len(lengths):
+            self.states = np.concatenate([self.states, states])
+            self.lengths = np.concatenate([self.lengths, lengths])
+            self._closed = None
+        return self
+
+    def _closed_stats(self):
+        """
+        Para cada estado, sufijos acumulados sobre las rachas cerradas (todas
+        menos la última): count[L] = rachas de largo >= L y total[L] = suma de
+        sus largos. Se recalculan solo cuando se cierra una racha.
+        """
+        if self._closed is None:
+            states, lengths = self.states[:-1], self.lengths[:-1]
+            size = int(lengths.max(initial=0)) + 2
+            self._closed = []
+            for state in range(len(STATES)):
+                hist = np.bincount(lengths[states == state], minlength=size)
+                count = np.cumsum(hist[::-1])[::-1]
+                total = np.cumsum((hist * np.arange(size))[::-1])[::-1]
+                self._closed.append((count, total))
+        return self._closed
+
+    def _closed_at(self, state, length):
+        count, total = self._closed_stats()[state]
+        if length >= len(count):
+            return 0, 0
+        return int(count[length]), int(total[length])
+
+    def current_run(self):
+        """Racha abierta: (estado, largo), o (None, 0) si no hay sorteos."""
+        if not len(self.lengths):
+            return None, 0
+        return STATES[self.states[-1]], int(self.lengths[-1])
+
+    def counts_runs(self, length):
+        """
+        Posiciones donde terminan 'length' paridades iguales, por estado.
+        Igual a MarkovPredictor(order=length).counts_runs: una racha de largo
+        r >= length aporta r - length + 1.
+        """
+        state_open, length_open = self.current_run()
+        counts = {}
+        for state, name in enumerate(STATES):
+            count, total = self._closed_at(state, length)
+            n = total - (length - 1) * count
+            if name == state_open and length_open >= length:
+                n += length_open - length + 1
+            counts[name] = n
+        return counts
+
+    def after_runs(self, length):
+        """
+        Qué vino después de 'length' paridades iguales, como
+        MarkovPredictor(order=length).after_runs: dentro de una racha de largo
+        r se repite el estado r - length veces y, si la racha se cerró, cambia una vez.
+        """
+        state_open, length_open = self.current_run()
+        after = {}
+        for state, name in enumerate(STATES):
+            count, total = self._closed_at(state, length)
+            same = total - length * count
+            if name == state_open and length_open >= length:
+                same += length_open - length
+            other = STATES[1 - state]
+            after[name] = {name: same, other: count}
+        return after
+
+    def run_counts(self, length):
+        """
+        Rachas cerradas de largo >= 'length', por estado. A diferencia de
+        counts_runs cada racha cuenta una sola vez, así que con sorteos al azar
+        son ensayos independientes y sirven para probar significancia.
+        """
+        return {name: self._closed_at(state, length)[0] for state, name in enumerate(STATES)}
+
+    def predict_global(self, length):
+        """Igual a MarkovPredictor(order=length).predict_global(), leído del índice."""
+        counts = self.counts_runs(length)
+        total = sum(counts.values())
+        if total == 0:
+            probs = {'Par': 0.5, 'Impar': 0.5}
+        else:
+            probs = {state: counts[state] / total for state in STATES}
+        return max(probs, key=probs.get), probs
+
+    def histogram(self, state=None, include_open=True):
+        """{largo: cantidad de rachas}, opcionalmente de un solo estado ('Par'/'Impar')."""
+        states, lengths = self.states, self.lengths
+        if not include_open:
+            states, lengths = states[:-1], lengths[:-1]
+        if state is not None:
+            lengths = lengths[states == STATES.index(state)]
+        hist = np.bincount(lengths)
+        return {int(length): int(hist[length]) for length in np.flatnonzero(hist)}
+
+    def longest(self, n=5, state=None):
+        """Las n rachas más largas como (estado, largo, posición de inicio), de mayor a menor."""
+        starts = np.cumsum(self.lengths) - self.lengths
+        candidates = np.arange(len(self.lengths))
+        if state is not None:
+            candidates = candidates[self.states == STATES.index(state)]
+        # Orden estable: ante empate aparece primero la racha más antigua
+        top = candidates[np.argsort(-self.lengths[candidates], kind='stable')[:n]]
+        return [(STATES[self.states[i]], int(self.lengths[i]), int(starts[i])) for i in top]
+
+    def save(self, path, history):
+        """Guarda el índice con una huella de los últimos sorteos de 'history' (ver load)."""
+        fingerprint = np.asarray(history[max(self.draws_seen - SNAPSHOT_FINGERPRINT, 0):self.draws_seen], dtype=np.int64)
+        save_npz(
+            path,
+            version=RUNS_VERSION,
+            draws_seen=self.draws_seen,
+            states=self.states,
+            lengths=self.lengths,
+            fingerprint=fingerprint,
+        )
+
+    @classmethod
+    def load(cls, path, history=None):
+        """
+        Restaura el índice guardado. Si se pasa 'history', retorna None cuando
+        el índice no corresponde a un prefijo de ese historial.
+        """
+        with np.load(path) as data:
+            if int(data['version']) != RUNS_VERSION:
+                return None
+            draws_seen = int(data['draws_seen'])
+            if history is not None:
+                fingerprint = data['fingerprint']
+                if draws_seen > len(history):
+                    return None
+                start = draws_seen - len(fingerprint)
+                if not np.array_equal(np.asarray(history[start:draws_seen], dtype=np.int64), fingerprint):
+                    return None
+            index = cls()
+            index.draws_seen = draws_seen
+            index.states = data['states'].astype(np.uint8)
+            index.lengths = data['lengths'].astype(np.int64)
+        return index
+
+
+def load_run_index(history, path=RUNS_FILE):
+    """
+    Carga el índice guardado en 'path', lo extiende con los sorteos nuevos de
+    'history' y lo vuelve a guardar. Si no existe o no coincide, lo reconstruye.
+    """
+    index = None
+    if os.path.exists(path):
+        try:
+            index = RunIndex.load(path, history)
+        except (OSError, ValueError, KeyError):
+            index = None
+    if index is None:
+        index = RunIndex()
+
+    if index.draws_seen < len(history) or not os.path.exists(path):
+        index.extend(history[index.draws_seen:])
+        index.save(path, history)
+    return index
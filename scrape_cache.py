@@ -0,0 +1,50 @@
+"""
+Caché en disco (SQLite) de los números ya extraídos por fecha.
+
+Los resultados de fechas pasadas no cambian, así que se guardan una vez y
+scrape_loteka los reutiliza; la fecha de hoy siempre se vuelve a descargar.
+"""
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+CACHE_FILE = os.getenv('SCRAPER_CACHE_FILE', 'scrape_cache.sqlite3')
+
+
+class ScrapeCache:
+    """Tabla fecha -> números, segura para usar desde varios hilos."""
+
+    def __init__(self, path=CACHE_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS resultados ("
+                "fecha TEXT PRIMARY KEY, numeros TEXT NOT NULL, guardado TEXT NOT NULL)"
+            )
+
+    def get(self, fecha):
+        """Retorna la lista de números guardada para 'fecha' (DD/MM/YYYY) o None."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT numeros FROM resultados WHERE fecha = ?", (fecha,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, fecha, numeros):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO resultados (fecha, numeros, guardado) VALUES (?, ?, ?)",
+                (fecha, json.dumps(numeros), datetime.now().isoformat(timespec='seconds'))
+            )
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM resultados").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
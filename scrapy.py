@@ -1,19 +1,33 @@
 #!c:/Users/LMiguelGJ/Desktop/LotePy/.venv/Scripts/python.exe
 from dotenv import load_dotenv, set_key, find_dotenv
 import os
-import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import requests
-from bs4 import BeautifulSoup
-from urllib.parse import quote
+from urllib.parse import quote, urlparse
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import pytz
 
+from extractors import extract_numbers
+from frequency_index import update_frequency_index
+from scrape_cache import ScrapeCache
+from storage import JSON_FILE, append_draws, atomic_write, file_lock, read_tail
+
 # Load environment variables
 load_dotenv()
 
-def scrape_loteka(fecha):
+BASE_URL = os.getenv('LOTEKA_BASE_URL', 'https://loteka.com.do/wp-content/themes/loteka/getChanceExpress.php')
+# Máximo de peticiones simultáneas y peticiones por segundo permitidas por host
+MAX_IN_FLIGHT = int(os.getenv('SCRAPER_MAX_IN_FLIGHT', '8'))
+RATE_LIMIT = float(os.getenv('SCRAPER_RATE_LIMIT', '5'))
+# Zona horaria de RD (UTC-4), usada para saber qué fechas ya están completas
+RD_TZ = pytz.timezone('America/Santo_Domingo')
+
+def build_session(pool_size=MAX_IN_FLIGHT):
+    """Crea una sesión con reintentos y un pool de conexiones compartible entre hilos."""
     # Configure retry strategy
     retry_strategy = Retry(
         total=5,
@@ -23,72 +37,185 @@ def scrape_loteka(fecha):
         status_forcelist=[429, 500, 502, 503, 504],
         allowed_methods=["GET", "HEAD"]
     )
-    adapter = HTTPAdapter(max_retries=retry_strategy)
+    adapter = HTTPAdapter(max_retries=retry_strategy, pool_connections=pool_size, pool_maxsize=pool_size)
     session = requests.Session()
     session.mount("https://", adapter)
     session.mount("http://", adapter)
     session.headers.update({
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) LotekaScraper/1.0"
     })
+    return session
+
+class RateLimiter:
+    """Espacia las peticiones a un mismo host para no superar 'rate' peticiones por segundo."""
+
+    def __init__(self, rate=RATE_LIMIT):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self.next_slot = {}
+        self.lock = threading.Lock()
+
+    def wait(self, url):
+        if not self.interval:
+            return
+        host = urlparse(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+def fecha_completa(fecha):
+    """Una fecha (DD/MM/YYYY) está completa si ya terminó en hora de RD."""
+    return datetime.strptime(fecha, '%d/%m/%Y').date() < datetime.now(RD_TZ).date()
+
+def scrape_loteka(fecha, session=None, rate_limiter=None, base_url=None, cache=None, log=print):
+    # Las fechas pasadas se sirven desde la caché si ya fueron descargadas
+    if cache is not None:
+        cached = cache.get(fecha)
+        if cached is not None:
+            return cached
+    
+    if session is None:
+        session = build_session(pool_size=1)
     
     fecha_codificada = quote(fecha)
-    url = f'https://loteka.com.do/wp-content/themes/loteka/getChanceExpress.php?fechaSeleccionada={fecha_codificada}'
+    url = f'{base_url or BASE_URL}?fechaSeleccionada={fecha_codificada}'
+    
+    if rate_limiter is not None:
+        rate_limiter.wait(url)
     
     try:
         # Add timeout parameter (12 seconds)
         response = session.get(url, timeout=12)
         response.raise_for_status()
     except requests.exceptions.RequestException as e:
-        print(f"Error fetching data for {fecha}: {str(e)}")
+        log(f"Error fetching data for {fecha}: {str(e)}")
         return []
     
-    # Analizar el contenido HTML
-    soup = BeautifulSoup(response.text, 'html.parser')
-    
-    # Encontrar todos los elementos <li>
-    li_elements = soup.find_all('li')
-    
-    # Lista para almacenar los primeros números
-    numbers = []
-    
-    # Iterar sobre cada <li> y obtener solo el primer <span class="numero">
-    for li in li_elements:
-        first_number_span = li.find('span', class_='numero')
-        if first_number_span:
-            numbers.append(first_number_span.text.strip())
+    # Extraer el primer <span class="numero"> de cada <li>
+    numbers = extract_numbers(response.text)
     
     # Invertir la lista de números
     numbers.reverse()
+    
+    # Guardar solo fechas completas con resultados; hoy puede tener sorteos pendientes
+    if cache is not None and numbers and fecha_completa(fecha):
+        cache.put(fecha, numbers)
     return numbers
 
+def scrape_dates(fechas, max_in_flight=MAX_IN_FLIGHT, rate_limit=RATE_LIMIT, base_url=None, cache=None,
+                 log=print, progress=None):
+    """
+    Descarga varias fechas en paralelo con una sola sesión compartida.
+    Retorna las listas de números en el mismo orden que 'fechas'.
+    'progress(fecha, numeros)' se llama en ese orden a medida que llegan; si
+    lanza una excepción, las descargas pendientes se cancelan.
+    """
+    if not fechas:
+        return []
+    session = build_session(pool_size=max_in_flight)
+    rate_limiter = RateLimiter(rate_limit)
+    pool = ThreadPoolExecutor(max_workers=max_in_flight)
+    try:
+        resultados = []
+        descargas = pool.map(lambda fecha: scrape_loteka(fecha, session, rate_limiter, base_url, cache, log), fechas)
+        for fecha, numeros in zip(fechas, descargas):
+            resultados.append(numeros)
+            if progress is not None:
+                progress(fecha, numeros)
+        return resultados
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        session.close()
+
 # Fecha inicial en formato DD/MM/YYYY
 # fecha = '05/03/2025'
 
-def get_existing_numbers():
+# Solapamiento mínimo para deducir de los valores, sin LAST_PROCESSED_COUNT,
+# que los primeros sorteos de una fecha ya estaban guardados
+MIN_OVERLAP = 10
+
+def normalize_number(value):
+    """Normaliza un sorteo para comparar: 7, '7' y '07' son el mismo número."""
     try:
-        with open('loteka_numbers.json', 'r') as f:
-            existing_numbers = json.load(f)
-            # Get the last 10 numbers as reference (from the end of the list)
-            return existing_numbers if len(existing_numbers) < 10 else existing_numbers[-10:]
-    except (FileNotFoundError, json.JSONDecodeError):
-        return []
+        return int(value)
+    except (ValueError, TypeError):
+        return value
 
-def main():
-    dotenv_path = find_dotenv()
-    load_dotenv(dotenv_path)
-    # Get existing numbers
-    reference_numbers = get_existing_numbers()
-    all_existing_numbers = []
+def find_overlap(stored, fetched):
+    """
+    Longitud del solapamiento más largo entre el final de 'stored' y el inicio
+    de 'fetched' (sufijo de uno igual a prefijo del otro), usando KMP en O(n + m).
+    """
+    pattern = [normalize_number(x) for x in fetched]
+    text = [normalize_number(x) for x in stored[-len(pattern):]] if pattern else []
+
+    # Función de fallo de KMP sobre el patrón (números descargados)
+    failure = [0] * len(pattern)
+    k = 0
+    for i in range(1, len(pattern)):
+        while k and pattern[i] != pattern[k]:
+            k = failure[k - 1]
+        if pattern[i] == pattern[k]:
+            k += 1
+        failure[i] = k
+
+    # Recorrer el final del historial; al terminar, k es el prefijo ya guardado
+    k = 0
+    for value in text:
+        while k and (k == len(pattern) or value != pattern[k]):
+            k = failure[k - 1]
+        if value == pattern[k]:
+            k += 1
+    return k
 
+def stored_prefix(stored, first_day, already_stored=None, min_overlap=MIN_OVERLAP):
+    """
+    Cuántos sorteos de 'first_day' (los de LAST_PROCESSED_DATE, la única fecha
+    que puede estar guardada en parte) ya están al final de 'stored'.
+    Se usa 'already_stored' (LAST_PROCESSED_COUNT) si el final del historial
+    lo confirma. Si no hay conteo o no coincide (por ejemplo, tras borrar el
+    último número), se busca el solapamiento, pero solo se acepta si abarca al
+    menos min_overlap sorteos (o la fecha completa, si tiene menos): uno o dos
+    números iguales por azar no bastan para descartar sorteos.
+    """
+    if already_stored is not None and 0 <= already_stored <= len(first_day):
+        tail = stored[len(stored) - already_stored:] if already_stored else []
+        if [normalize_number(x) for x in tail] == [normalize_number(x) for x in first_day[:already_stored]]:
+            return already_stored
+    overlap = find_overlap(stored, first_day)
+    return overlap if overlap >= min(min_overlap, len(first_day)) else 0
+
+def merge_new_numbers(stored, fetched_by_date, already_stored=None, min_overlap=MIN_OVERLAP):
+    """
+    Retorna, en orden, los números de 'fetched_by_date' (una lista por fecha,
+    desde LAST_PROCESSED_DATE) que aún no están al final de 'stored'.
+    """
+    if not fetched_by_date:
+        return []
+    first_day = fetched_by_date[0]
+    nuevos = list(first_day[stored_prefix(stored, first_day, already_stored, min_overlap):])
+    for numeros in fetched_by_date[1:]:
+        nuevos.extend(numeros)
+    return nuevos
+
+def _read_count(value):
     try:
-        with open('loteka_numbers.json', 'r') as f:
-            all_existing_numbers = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        all_existing_numbers = []
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def main(log=print):
+    dotenv_path = find_dotenv()
+    # override: al correr dentro del mismo proceso (la app) la fecha anterior ya está en el entorno
+    load_dotenv(dotenv_path, override=True)
+    # Solo importa si ya hay datos; un JSON corrupto lanza error en lugar de
+    # tratarse como vacío (lo que forzaría descargar todo de nuevo)
+    hay_datos = bool(read_tail(JSON_FILE, 1))
 
     # Usar zona horaria de RD (UTC-4) en lugar del servidor
-    rd_tz = pytz.timezone('America/Santo_Domingo')
-    fecha_rd = datetime.now(rd_tz)
+    fecha_rd = datetime.now(RD_TZ)
     
     # Encontrar la fecha más reciente en lugar de usar .env
     # Por defecto usar 15/10/2019 si no hay datos
@@ -96,74 +223,82 @@ def main():
     
     # Usar LAST_PROCESSED_DATE del archivo .env si existe
     env_last_date = os.getenv('LAST_PROCESSED_DATE')
+    # Sorteos de esa fecha que ya quedaron guardados en la corrida anterior
+    already_stored = None
     if env_last_date:
         last_date = env_last_date
-    elif all_existing_numbers:
+        already_stored = _read_count(os.getenv('LAST_PROCESSED_COUNT'))
+    elif hay_datos:
         # Si no hay fecha en .env pero hay datos, usar la fecha actual de RD
         last_date = fecha_rd.strftime('%d/%m/%Y')
     
     fecha = last_date
-    print(f"Iniciando desde {last_date}")
+    log(f"Iniciando desde {last_date}")
 
     # Convertir la fecha inicial a objeto datetime
     fecha_actual = datetime.strptime(fecha, '%d/%m/%Y')
     fecha_hoy = fecha_rd.replace(tzinfo=None)
 
-    # Lista para almacenar los nuevos resultados
-    nuevos_resultados = []
-
-    # Bucle mientras la fecha sea menor a hoy
+    # Fechas pendientes desde la inicial hasta hoy
+    fechas = []
     while fecha_actual <= fecha_hoy:
-        fecha_formateada = fecha_actual.strftime('%d/%m/%Y')
-        print(f"\nResultados para {fecha_formateada}:")
-        resultados = scrape_loteka(fecha_formateada)
+        fechas.append(fecha_actual.strftime('%d/%m/%Y'))
+        fecha_actual += timedelta(days=1)
+
+    def mostrar(fecha_formateada, resultados):
+        log(f"\nResultados para {fecha_formateada}:")
         if resultados:
-            print("Numeros:", ", ".join(resultados))
+            log("Numeros:", ", ".join(resultados))
         else:
-            print("Sin numeros encontrados")
-        
-        # Check if we found our reference numbers (checking from the end)
-        found_overlap = False
-        for i in range(len(resultados)):
-            if resultados[i:i+len(reference_numbers)] == reference_numbers:
-                # We found the overlap point, add only numbers that come after
-                nuevos_resultados.extend(resultados[i+len(reference_numbers):])
-                found_overlap = True
-                break
-        
-        if not found_overlap:
-            # No overlap found, add all numbers
-            nuevos_resultados.extend(resultados)
-        
-        fecha_actual += timedelta(days=1)
+            log("Sin numeros encontrados")
 
-    # Combine existing numbers with new ones
-    todos_resultados = all_existing_numbers + nuevos_resultados
+    # Descargar en paralelo; los resultados se muestran en orden de fecha a medida que llegan
+    cache = ScrapeCache()
+    try:
+        resultados_por_fecha = scrape_dates(fechas, cache=cache, log=log, progress=mostrar)
+    finally:
+        cache.close()
 
-    # Guardar los resultados combinados en el archivo JSON
-    with open('loteka_numbers.json', 'w') as f:
-        json.dump(todos_resultados, f, indent=4)
+    primer_dia = resultados_por_fecha[0] if resultados_por_fecha else []
+    with file_lock(JSON_FILE):
+        # Descartar lo que ya estaba guardado: solo puede ser el comienzo de la primera fecha
+        existentes = read_tail(JSON_FILE, len(primer_dia))
+        nuevos_resultados = merge_new_numbers(existentes, resultados_por_fecha, already_stored)
+        # Agregar solo los nuevos al diario del JSON
+        append_draws(nuevos_resultados, JSON_FILE)
+        # El índice de frecuencias solo recibe los sorteos nuevos
+        update_frequency_index(added=nuevos_resultados, json_path=JSON_FILE)
 
     if len(nuevos_resultados) > 0:
-        print(f"Resultados guardados. {len(nuevos_resultados)} nuevos numeros agregado.")
+        log(f"Resultados guardados. {len(nuevos_resultados)} nuevos numeros agregado.")
     else:
-        print("Resultados guardados. 0 nuevos numeros agregado.")
+        log("Resultados guardados. 0 nuevos numeros agregado.")
 
     # Actualizar LAST_PROCESSED_DATE en el archivo .env manualmente
     # Usar la última fecha procesada (fecha_actual - 1 día) en lugar de fecha_hoy
     updated_date_str = (fecha_actual - timedelta(days=1)).strftime('%d/%m/%Y')
+    # Sorteos de esa fecha ya guardados; si solo se consultó la fecha anterior
+    # y no respondió, se conserva el conteo previo
+    if len(resultados_por_fecha) == 1:
+        updated_count = max(len(primer_dia), already_stored or 0)
+    else:
+        updated_count = len(resultados_por_fecha[-1]) if resultados_por_fecha else (already_stored or 0)
+    valores = {'LAST_PROCESSED_DATE': f"'{updated_date_str}'", 'LAST_PROCESSED_COUNT': str(updated_count)}
     
-    with open(dotenv_path, 'r') as f:
-        lines = f.readlines()
-
-    with open(dotenv_path, 'w') as f:
+    with file_lock(dotenv_path):
+        with open(dotenv_path, 'r') as f:
+            lines = f.readlines()
+        if lines and not lines[-1].endswith('\n'):
+            lines[-1] += '\n'
+        pendientes = dict(valores)
+        contenido = []
         for line in lines:
-            if line.startswith('LAST_PROCESSED_DATE='):
-                f.write(f"LAST_PROCESSED_DATE='{updated_date_str}'\n")
-            else:
-                f.write(line)
+            clave = line.split('=', 1)[0]
+            contenido.append(f"{clave}={pendientes.pop(clave)}\n" if clave in pendientes else line)
+        contenido.extend(f"{clave}={valor}\n" for clave, valor in pendientes.items())
+        atomic_write(dotenv_path, ''.join(contenido))
 
-    print("✅ Database Update completed successfully!")
+    log("✅ Database Update completed successfully!")
     return nuevos_resultados
 
 if __name__ == "__main__":
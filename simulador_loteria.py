@@ -3,6 +3,7 @@
 Simulador de Juego de Lotería
 Basado en las reglas especificadas con apuestas PAR/IMPAR y progresión de apuestas
 """
+import numpy as np
 
 # Tabla de progresión de apuestas
 PROGRESION_APUESTAS = {
@@ -23,6 +24,11 @@ PAGO_PRIMERA_CHANCE = 70  # pesos por cada peso apostado
 NUMEROS_PARES = list(range(0, 100, 2))  # [0, 2, 4, ..., 98]
 NUMEROS_IMPARES = list(range(1, 100, 2))  # [1, 3, 5, ..., 99]
 
+# Tabla de progresión como arreglos indexados por ronda (índice 0 sin uso)
+RONDA_MAXIMA = max(PROGRESION_APUESTAS)
+APUESTA_TOTAL = np.array([0] + [PROGRESION_APUESTAS[r]["apuesta_total"] for r in range(1, RONDA_MAXIMA + 1)], dtype=np.int64)
+PAGO_POR_RONDA = np.array([0] + [PAGO_PRIMERA_CHANCE * PROGRESION_APUESTAS[r]["apuesta_por_numero"] for r in range(1, RONDA_MAXIMA + 1)], dtype=np.int64)
+
 
 def obtener_eleccion_sorteo():
     """Pregunta al usuario si quiere jugar PAR o IMPAR en cada sorteo"""
@@ -132,6 +138,116 @@ def simular_ronda(numero_sorteo, eleccion_usuario, ronda_actual, capital, total_
         return False, capital, total_invertido, 0, -apuesta_total
 
 
+def trayectoria_progresion(aciertos, reiniciar_en_limite=False, ronda_inicial=1):
+    """
+    Ronda, apuesta, resultado neto y neto acumulado de cada sorteo para una
+    matriz de aciertos (filas x sorteos), suponiendo capital ilimitado.
+    También retorna, por fila, el sorteo en que se pierde la ronda 10 (-1 si
+    no ocurre o si 'reiniciar_en_limite' vuelve a la ronda 1).
+    'ronda_inicial' (valor o uno por fila) permite continuar una partida.
+    """
+    n = aciertos.shape[1]
+    idx = np.arange(n)
+    ronda_inicial = np.broadcast_to(np.asarray(ronda_inicial, dtype=np.int64), (len(aciertos),))
+
+    # Ronda de cada sorteo = 1 + derrotas consecutivas desde el último acierto
+    # (la ronda inicial equivale a un acierto "virtual" ronda_inicial sorteos antes)
+    ultimo_acierto = np.maximum.accumulate(np.where(aciertos, idx, -ronda_inicial[:, None]), axis=1)
+    derrotas_previas = np.empty(aciertos.shape, dtype=np.int64)
+    derrotas_previas[:, :1] = ronda_inicial[:, None] - 1
+    derrotas_previas[:, 1:] = idx[:-1] - ultimo_acierto[:, :-1]
+    if reiniciar_en_limite:
+        ronda = derrotas_previas % RONDA_MAXIMA + 1
+        limite = np.full(len(aciertos), -1)
+    else:
+        ronda = np.minimum(derrotas_previas, RONDA_MAXIMA - 1) + 1
+        perdio_limite = (ronda == RONDA_MAXIMA) & ~aciertos
+        limite = np.where(perdio_limite.any(axis=1), perdio_limite.argmax(axis=1) if n else 0, -1)
+
+    apuesta = APUESTA_TOTAL[ronda]
+    neto = np.where(aciertos, PAGO_POR_RONDA[ronda], 0) - apuesta
+    acumulado = np.cumsum(neto, axis=1)
+    return ronda, apuesta, neto, acumulado, limite
+
+
+def simular_aciertos(aciertos, capital, reiniciar_en_limite=False):
+    """
+    Aplica la progresión de apuestas a una matriz de aciertos (escenarios x sorteos)
+    con las mismas reglas de simular_ronda: se apuesta la ronda actual, al ganar
+    se vuelve a la ronda 1 y al perder se avanza. El escenario termina en
+    bancarrota (capital menor que la apuesta de la ronda, sin apostar) o al
+    perder la ronda 10, salvo que 'reiniciar_en_limite' vuelva a la ronda 1.
+
+    'aciertos' puede tener una sola fila compartida por todos los capitales.
+    """
+    aciertos = np.atleast_2d(np.asarray(aciertos, dtype=bool))
+    capital = np.atleast_1d(np.asarray(capital, dtype=np.int64))
+    escenarios = max(len(aciertos), len(capital))
+    filas = np.arange(escenarios) % len(aciertos)
+    capital = np.broadcast_to(capital, (escenarios,))
+    n = aciertos.shape[1]
+    idx = np.arange(n)
+
+    ronda, apuesta, neto, acumulado, limite = trayectoria_progresion(aciertos, reiniciar_en_limite)
+    # Capital necesario para poder apostar en cada sorteo (su máximo acumulado es monótono)
+    necesario = np.maximum.accumulate(apuesta - (acumulado - neto), axis=1)
+
+    fin = np.empty(escenarios, dtype=np.int64)
+    bancarrota = np.full(escenarios, -1)
+    limite_en = np.full(escenarios, -1)
+    conteo_rondas = np.zeros((escenarios, RONDA_MAXIMA + 1), dtype=np.int64)
+    conteo_aciertos = np.zeros((escenarios, RONDA_MAXIMA + 1), dtype=np.int64)
+    for s in range(escenarios):
+        fila = filas[s]
+        quiebra = int(np.searchsorted(necesario[fila], capital[s], side='right'))
+        fin[s] = n
+        if limite[fila] >= 0:
+            fin[s] = limite[fila] + 1
+            limite_en[s] = limite[fila]
+        if quiebra < fin[s]:
+            fin[s] = quiebra
+            bancarrota[s] = quiebra
+            limite_en[s] = -1
+        conteo_rondas[s] = np.bincount(ronda[fila, :fin[s]], minlength=RONDA_MAXIMA + 1)
+        conteo_aciertos[s] = np.bincount(ronda[fila, :fin[s]][aciertos[fila, :fin[s]]], minlength=RONDA_MAXIMA + 1)
+
+    jugado = idx[None, :] < fin[:, None]
+    curva = capital[:, None] + np.where(jugado, acumulado[filas], 0)
+    ultimo = capital + np.where(fin > 0, acumulado[filas, np.maximum(fin - 1, 0)] if n else 0, 0)
+    curva = np.where(jugado, curva, ultimo[:, None])
+    pico = np.maximum(np.maximum.accumulate(curva, axis=1), capital[:, None])
+
+    return {
+        'capital': curva,
+        'final_capital': ultimo,
+        'max_drawdown': (pico - curva).max(axis=1, initial=0),
+        'bankrupt_at': bancarrota,
+        'limit_at': limite_en,
+        'rounds_played': fin,
+        'level_counts': conteo_rondas[:, 1:],
+        'win_counts': conteo_aciertos[:, 1:],
+    }
+
+
+def simulate(draws, choices, capital, reiniciar_en_limite=False):
+    """
+    Simula la progresión sobre un historial completo sin interacción.
+
+    'choices' es 'PAR'/'IMPAR', una secuencia de elecciones por sorteo o una
+    matriz (escenarios x sorteos); 'capital' es un valor o un arreglo de
+    capitales iniciales. Todos los resultados tienen un escenario por fila:
+    curvas de capital, capital final, máxima caída, sorteo de bancarrota o de
+    límite de rondas (-1 si no ocurrió), sorteos jugados y conteo de apuestas
+    y aciertos por ronda (1..10).
+    """
+    paridad = np.asarray(draws, dtype=np.int64) % 2
+    elecciones = np.asarray(choices)
+    if elecciones.dtype.kind in 'US':
+        elecciones = np.char.upper(elecciones) == 'IMPAR'
+    aciertos = elecciones.astype(np.int64) == paridad
+    return simular_aciertos(aciertos, capital, reiniciar_en_limite)
+
+
 def mostrar_resultado_ronda(ronda, numero_sorteo, eleccion, apuesta, resultado, 
                            pago, ganancia_neta, capital, volver_ronda1=False):
     """Muestra el resultado de la ronda formateado"""
@@ -0,0 +1,258 @@
+#!c:/Users/LMiguelGJ/Desktop/LotePy/.venv/Scripts/python.exe
+"""
+Cadenas de Markov sobre estados configurables con conteos dispersos.
+
+MarkovPredictor reduce cada sorteo a Par/Impar. Aquí el estado lo define un
+StateMapper (paridad, alto/bajo, decena, último dígito o el número 00-99) y
+las transiciones se guardan dispersas: cada par (contexto, siguiente estado)
+se codifica como un entero y solo se guardan los pares observados, en un
+arreglo ordenado con sus conteos. Con 100 estados y orden k hay 100**k
+contextos posibles, pero nunca se guardan más pares que sorteos vistos.
+
+min_count se aplica al predecir (un contexto con menos transiciones se trata
+como sin datos) y prune() descarta esos contextos, y los que excedan
+max_contexts, para acotar la memoria. La poda solo ocurre al llamar prune()
+y siempre sobre los conteos acumulados, así el modelo no depende de cómo se
+repartieron los sorteos entre fit() y update().
+"""
+from collections import deque
+
+import numpy as np
+
+from MarkovPY import STATES, load_history
+
+# Incrementos de update() acumulados antes de fusionarlos con los arreglos
+PENDING_LIMIT = 4096
+# Los pares (contexto, siguiente) se codifican en un int64
+MAX_KEY = 2 ** 63 - 1
+
+
+class StateMapper:
+    """Convierte sorteos (0-99) en estados 0..len(labels)-1 con una función vectorizada."""
+
+    def __init__(self, name, labels, func):
+        self.name = name
+        self.labels = tuple(labels)
+        self.func = func
+
+    @property
+    def n_states(self):
+        return len(self.labels)
+
+    def __call__(self, numbers):
+        return self.func(np.asarray(numbers, dtype=np.int64)).astype(np.int64)
+
+
+MAPPERS = {
+    'parity': StateMapper('parity', STATES, lambda x: x % 2),
+    'high_low': StateMapper('high_low', ('Bajo', 'Alto'), lambda x: (x >= 50).astype(np.int64)),
+    'decade': StateMapper('decade', [f"{d}0-{d}9" for d in range(10)], lambda x: x // 10),
+    'last_digit': StateMapper('last_digit', [str(d) for d in range(10)], lambda x: x % 10),
+    'number': StateMapper('number', [f"{n:02d}" for n in range(100)], lambda x: x),
+}
+
+
+class SparseCounts:
+    """
+    Conteos de transiciones de un largo de contexto k. 'keys' está ordenado y
+    cada clave es contexto * n_states + siguiente; 'counts' va en paralelo.
+    """
+
+    def __init__(self, n_states):
+        self.n_states = n_states
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def nbytes(self):
+        return self.keys.nbytes + self.counts.nbytes
+
+    def add(self, keys, counts=None):
+        """Suma ocurrencias de 'keys' (con repeticiones, o con sus 'counts')."""
+        if counts is None:
+            keys, counts = np.unique(keys, return_counts=True)
+        if len(keys) == 0:
+            return
+        merged = np.concatenate([self.keys, keys])
+        unique, inverse = np.unique(merged, return_inverse=True)
+        self.counts = np.bincount(inverse, weights=np.concatenate([self.counts, counts]),
+                                  minlength=len(unique)).astype(np.int64)
+        self.keys = unique
+
+    def lookup(self, context):
+        """Conteos del siguiente estado para un contexto, como arreglo de n_states."""
+        base = context * self.n_states
+        lo, hi = np.searchsorted(self.keys, [base, base + self.n_states])
+        row = np.zeros(self.n_states, dtype=np.int64)
+        row[self.keys[lo:hi] - base] = self.counts[lo:hi]
+        return row
+
+    def context_totals(self):
+        """(contextos, total de transiciones de cada uno), ordenados por contexto."""
+        contexts, starts = np.unique(self.keys // self.n_states, return_index=True)
+        if len(contexts) == 0:
+            return contexts, np.zeros(0, dtype=np.int64)
+        return contexts, np.add.reduceat(self.counts, starts)
+
+    def prune(self, min_count=0, max_contexts=None):
+        """Descarta los contextos con menos de 'min_count' transiciones y deja a lo sumo 'max_contexts'."""
+        contexts, totals = self.context_totals()
+        keep = totals >= min_count
+        if max_contexts is not None and keep.sum() > max_contexts:
+            # Entre los contextos que pasan min_count, quedan los más frecuentes
+            ranked = np.argsort(-np.where(keep, totals, -1), kind='stable')
+            keep = np.zeros(len(contexts), dtype=bool)
+            keep[ranked[:max_contexts]] = True
+        if keep.all():
+            return 0
+        mask = np.isin(self.keys // self.n_states, contexts[keep])
+        dropped = int((~keep).sum())
+        self.keys, self.counts = self.keys[mask], self.counts[mask]
+        return dropped
+
+
+class SparseMarkovPredictor:
+    def __init__(self, order=1, mapper='parity', min_count=0, max_contexts=None):
+        self.order = order
+        self.mapper = MAPPERS[mapper] if isinstance(mapper, str) else mapper
+        n = self.mapper.n_states
+        if n ** (order + 1) > MAX_KEY:
+            raise ValueError(f"Orden {order} demasiado alto para {n} estados (máximo {self.max_order(n)})")
+        self.min_count = min_count  # Transiciones mínimas para usar (y, con prune(), conservar) un contexto
+        self.max_contexts = max_contexts  # prune(): contextos máximos por largo k
+        self.history = deque(maxlen=order)  # Últimos 'order' estados (enteros)
+        self.state_counts = np.zeros(n, dtype=np.int64)  # Frecuencia de cada estado (contexto vacío)
+        self.transitions = {k: SparseCounts(n) for k in range(1, order + 1)}
+        self._pending = {k: [] for k in range(1, order + 1)}
+        self.draws_seen = 0
+
+    @staticmethod
+    def max_order(n_states):
+        order = 0
+        while n_states ** (order + 2) <= MAX_KEY:
+            order += 1
+        return order
+
+    def _context(self, k):
+        """Código de los últimos k estados (el más antiguo es el dígito más significativo)."""
+        code = 0
+        for state in list(self.history)[-k:]:
+            code = code * self.mapper.n_states + state
+        return code
+
+    def decode(self, code, k):
+        n = self.mapper.n_states
+        digits = []
+        for _ in range(k):
+            code, digit = divmod(code, n)
+            digits.append(self.mapper.labels[digit])
+        return tuple(reversed(digits))
+
+    def _flush(self):
+        for k, pending in self._pending.items():
+            if pending:
+                self.transitions[k].add(np.array(pending, dtype=np.int64))
+                pending.clear()
+
+    def prune(self):
+        """
+        Descarta, sobre los conteos acumulados, los contextos con menos de
+        min_count transiciones y deja a lo sumo max_contexts por largo k.
+        Los conteos descartados no se recuperan: conviene podar después de
+        entrenar. Retorna {k: contextos descartados}.
+        """
+        self._flush()
+        return {k: table.prune(self.min_count, self.max_contexts) for k, table in self.transitions.items()}
+
+    def update(self, number):
+        """Agrega un sorteo; los incrementos se fusionan por lotes (ver PENDING_LIMIT)."""
+        state = int(self.mapper([number])[0])
+        n = self.mapper.n_states
+        for k in range(1, len(self.history) + 1):
+            self._pending[k].append(self._context(k) * n + state)
+        self.history.append(state)
+        self.state_counts[state] += 1
+        self.draws_seen += 1
+        if len(self._pending[1]) >= PENDING_LIMIT:
+            self._flush()
+
+    def fit(self, numbers):
+        """Entrena en bloque; equivale a llamar update() con cada número."""
+        new_states = self.mapper(numbers)
+        if len(new_states) == 0:
+            return self
+        self._flush()
+        n = self.mapper.n_states
+        prev = np.array(self.history, dtype=np.int64)
+        states = np.concatenate([prev, new_states])
+        total = len(states)
+        for k in range(1, self.order + 1):
+            start = max(len(prev), k)
+            if start >= total:
+                continue
+            codes = np.zeros(total - start, dtype=np.int64)
+            for j in range(k):
+                codes = codes * n + states[start - k + j:total - k + j]
+            self.transitions[k].add(codes * n + states[start:])
+        self.state_counts += np.bincount(new_states, minlength=n)
+        self.history.extend(int(s) for s in new_states[-self.order:])
+        self.draws_seen += len(new_states)
+        return self
+
+    @property
+    def nbytes(self):
+        """Memoria ocupada por los conteos de transiciones."""
+        return sum(table.nbytes for table in self.transitions.values())
+
+    def _probs(self, row):
+        total = row.sum()
+        if total == 0:
+            return {label: 1 / len(row) for label in self.mapper.labels}
+        return {label: int(c) / total for label, c in zip(self.mapper.labels, row)}
+
+    def predict_global(self):
+        """Predice con la frecuencia de cada estado en todo el historial."""
+        probs = self._probs(self.state_counts)
+        return max(probs, key=probs.get), probs
+
+    def predict_with_context(self):
+        """
+        Back-off de clave exacta de largo k (order..1), como
+        MarkovPredictor.predict_with_context(). Los contextos con menos de
+        min_count transiciones se saltan.
+        """
+        self._flush()
+        for k in range(len(self.history), 0, -1):
+            code = self._context(k)
+            row = self.transitions[k].lookup(code)
+            if row.sum() > 0 and row.sum() >= self.min_count:
+                probs = self._probs(row)
+                return k, self.decode(code, k), max(probs, key=probs.get), probs
+        pred_global, probs_global = self.predict_global()
+        return 0, tuple(), pred_global, probs_global
+
+
+def main():
+    """Print the context prediction of every state mapper"""
+    print("🧩 Sparse Markov Analysis")
+    history = load_history('loteka_numbers.json')
+    order = 3
+
+    for name, mapper in MAPPERS.items():
+        predictor = SparseMarkovPredictor(order, mapper).fit(history)
+        k_used, key, predicted, probs = predictor.predict_with_context()
+        print(f"\n{'='*20}")
+        print(f"{name} (order {order}, {mapper.n_states} states)")
+        print(f"{'='*20}")
+        print(f"Context: {' '.join(key) or 'N/A'} (k={k_used})")
+        print(f"Prediction: {predicted} ({probs[predicted]:.1%})")
+        print(f"Memory: {predictor.nbytes / 1024:.1f} KiB")
+
+    print(f"\n✅ Analysis complete!")
+
+
+if __name__ == "__main__":
+    main()
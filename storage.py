@@ -0,0 +1,573 @@
+"""
+Almacenamiento de sorteos.
+
+El historial vive en el JSON (loteka_numbers.json), que se modifica de forma
+segura y sin reescribirlo completo en cada cambio:
+
+- atomic_write escribe a un temporal, hace fsync y lo renombra encima, así un
+  corte a mitad de escritura deja el archivo anterior intacto.
+- file_lock es un bloqueo entre procesos (fcntl / msvcrt) que comparten el
+  scraper y la app.
+- Los sorteos nuevos y los borrados se agregan a un diario (JOURNAL_SUFFIX),
+  una línea JSON por operación, en lugar de reescribir el JSON completo.
+  load_draws y read_tail aplican el diario; compact lo vuelca al JSON cuando
+  crece. La primera línea del diario identifica el JSON sobre el que se
+  escribió, así un diario ya volcado se ignora aunque un corte haya impedido
+  borrarlo.
+- DrawStore mantiene una copia binaria de los sorteos válidos (STORE_SUFFIX,
+  un byte por sorteo tras una cabecera fija), al día con append_draws,
+  pop_draws y compact bajo el mismo bloqueo. load_draw_store la expone como
+  np.memmap para entrenar sin cargar el JSON; si la firma de la cabecera no
+  coincide con el JSON y su diario (por ejemplo tras editar el JSON a mano o
+  un corte entre ambas escrituras), se reconstruye desde el JSON.
+"""
+import hashlib
+import io
+import json
+import os
+import struct
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+JSON_FILE = "loteka_numbers.json"
+
+JOURNAL_SUFFIX = ".journal"
+# Tamaño del diario a partir del cual se vuelca al JSON
+COMPACT_BYTES = 64 * 1024
+# Bytes finales del JSON que identifican su versión en el diario
+SIGNATURE_BYTES = 4096
+# Bytes leídos por bloque al cargar el JSON en streaming
+CHUNK_BYTES = 1 << 16
+# Marca de un valor no válido en el buffer de carga (los sorteos van de 0 a 99)
+INVALID = 255
+
+STORE_SUFFIX = ".bin"
+MAGIC = b"LOTKDRAW"
+STORE_VERSION = 2
+# Firma, versión, cantidad de sorteos y firma del JSON + diario que refleja
+HEADER = struct.Struct("<8sIQ20s")
+HEADER_SIZE = HEADER.size
+
+
+def coerce_draw(value):
+    """Convierte un sorteo (int o str como '07') a entero 0-99; lanza ValueError si no es válido."""
+    try:
+        number = int(value)
+    except (ValueError, TypeError):
+        raise ValueError(f"Sorteo no numérico: {value!r}")
+    if not 0 <= number <= 99:
+        raise ValueError(f"Sorteo fuera de rango 00-99: {value!r}")
+    return number
+
+
+def _parse_draw(token):
+    """Valor de un elemento JSON (b'7', b'"07"') como entero 0-99, o INVALID."""
+    token = token.strip()
+    if token[:1] == b'"' and token[-1:] == b'"':
+        token = token[1:-1]
+    try:
+        number = int(token)
+    except ValueError:
+        return INVALID
+    return number if 0 <= number <= 99 else INVALID
+
+
+def _parse_chunk(body):
+    """Elementos separados por comas de 'body' como arreglo uint8 (ver _parse_draw)."""
+    # Caso común: solo dígitos, comillas y espacios, de uno o dos dígitos por
+    # elemento; se convierte todo el bloque de una vez con NumPy
+    cleaned = body.translate(None, b' \t\r\n"')
+    if cleaned and not cleaned.translate(None, b'0123456789,'):
+        chars = np.frombuffer(cleaned, dtype=np.uint8)
+        commas = np.flatnonzero(chars == ord(','))
+        starts = np.concatenate([[0], commas + 1])
+        lengths = np.append(commas, len(chars)) - starts
+        if ((lengths == 1) | (lengths == 2)).all():
+            digits = chars.astype(np.int64) - ord('0')
+            first = digits[starts]
+            two = lengths == 2
+            second = digits[np.minimum(starts + 1, len(digits) - 1)]
+            return np.where(two, first * 10 + second, first).astype(np.uint8)
+    pieces = body.split(b',')
+    return np.fromiter((_parse_draw(p) for p in pieces), dtype=np.uint8, count=len(pieces))
+
+
+def iter_draw_chunks(path, chunk_bytes=CHUNK_BYTES):
+    """
+    Recorre el arreglo JSON plano de 'path' por bloques sin construir la lista
+    completa. Retorna arreglos uint8, uno por bloque, con cada elemento
+    convertido a 0-99 o INVALID si no es un sorteo válido (se conservan para
+    que las posiciones coincidan con las del JSON).
+    """
+    with open(path, "rb") as f:
+        data = f.read(chunk_bytes).lstrip().lstrip(b"[")
+        while True:
+            block = f.read(chunk_bytes)
+            data += block
+            if block:
+                # El último elemento puede estar cortado por el bloque
+                cut = data.rfind(b",")
+                if cut < 0:
+                    continue
+                body, data = data[:cut], data[cut + 1:]
+            else:
+                body = data.rstrip().rstrip(b"]")
+                if not body.strip():
+                    return
+            yield _parse_chunk(body)
+            if not block:
+                return
+
+
+def load_draw_array(path=JSON_FILE):
+    """
+    Historial válido como arreglo uint8, con el diario aplicado y descartando
+    valores no numéricos o fuera de 00-99. Los bloques se copian a un buffer
+    reservado de antemano (cada elemento ocupa al menos 2 bytes en el JSON),
+    sin pasar por una lista de objetos de Python.
+    """
+    with file_lock(path):
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        buffer = np.empty(size // 2 + 1, dtype=np.uint8)
+        n = 0
+        if size:
+            for chunk in iter_draw_chunks(path):
+                buffer[n:n + len(chunk)] = chunk
+                n += len(chunk)
+        ops = read_journal(path)
+    values = buffer[:n]
+    if ops:
+        # Las operaciones cuentan posiciones del JSON, válidas o no
+        added = []
+        for op in ops:
+            if "add" in op:
+                added.append(np.fromiter((_parse_draw(str(x).encode()) for x in op["add"]), dtype=np.uint8))
+            elif "pop" in op:
+                keep = max(len(values) + sum(map(len, added)) - op["pop"], 0)
+                values = np.concatenate([values, *added])[:keep]
+                added = []
+        values = np.concatenate([values, *added])
+    return values[values != INVALID].copy()
+
+
+def dataset_version(draws, tail=64):
+    """Identifica el estado del historial por su largo y un hash de los últimos sorteos."""
+    recientes = np.asarray([coerce_draw(x) for x in draws[-tail:]], dtype=np.uint8)
+    return f"{len(draws)}:{hashlib.sha1(recientes.tobytes()).hexdigest()[:16]}"
+
+
+def read_json_tail(path, n, block_size=4096):
+    """
+    Lee los últimos n elementos de un arreglo JSON plano (como loteka_numbers.json)
+    leyendo bloques desde el final del archivo, sin parsear el documento completo.
+    Los valores se retornan tal cual están en el JSON (int o str).
+    """
+    if n <= 0:
+        return []
+    with open(path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        read = min(block_size, size)
+        while True:
+            f.seek(size - read)
+            text = f.read(read).decode("utf-8", errors="ignore").rstrip()
+            at_start = read == size
+            if text.endswith("]"):
+                text = text[:-1]
+            if at_start:
+                text = text.lstrip()[1:]
+            pieces = text.split(",")
+            if not at_start:
+                # El primer fragmento puede estar cortado por el bloque
+                pieces = pieces[1:]
+            pieces = [p.strip() for p in pieces if p.strip()]
+            if len(pieces) >= n or at_start:
+                return [json.loads(p) for p in pieces[-n:]]
+            read = min(read * 2, size)
+
+
+def atomic_write(path, data):
+    """Reemplaza 'path' con 'data' (str o bytes) sin dejar nunca un archivo a medio escribir."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    # Temporal propio de este proceso e hilo: dos escritores no comparten el archivo
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if os.name != "nt":
+        # Persistir también el renombre
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def save_npz(path, **arrays):
+    """Guarda 'arrays' como .npz en 'path' con atomic_write."""
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    atomic_write(path, buffer.getvalue())
+
+
+# Bloqueos tomados por este proceso: ruta -> [RLock, profundidad, archivo]
+_file_locks = {}
+_file_locks_guard = threading.Lock()
+
+
+def _lock_file(f):
+    if os.name == "nt":
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                pass  # LK_LOCK se rinde tras 10 s; seguir esperando
+    else:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+
+def _unlock_file(f):
+    if os.name == "nt":
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+@contextmanager
+def file_lock(path):
+    """
+    Bloqueo exclusivo sobre 'path' (mediante 'path.lock') entre procesos e hilos.
+    Es reentrante dentro de un mismo hilo.
+    """
+    lock_path = os.path.abspath(f"{path}.lock")
+    with _file_locks_guard:
+        entry = _file_locks.setdefault(lock_path, [threading.RLock(), 0, None])
+    with entry[0]:
+        if entry[1] == 0:
+            f = open(lock_path, "a+b")
+            try:
+                _lock_file(f)
+            except BaseException:
+                f.close()
+                raise
+            entry[2] = f
+        entry[1] += 1
+        try:
+            yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                f, entry[2] = entry[2], None
+                _unlock_file(f)
+                f.close()
+
+
+def journal_path(path):
+    return f"{path}{JOURNAL_SUFFIX}"
+
+
+def _base_signature(path):
+    """Identifica el contenido actual del JSON por su tamaño y el hash de sus últimos bytes."""
+    if not os.path.exists(path):
+        return "0:"
+    with open(path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(size - SIGNATURE_BYTES, 0))
+        return f"{size}:{hashlib.sha1(f.read()).hexdigest()[:16]}"
+
+
+def read_journal(path=JSON_FILE):
+    """
+    Operaciones del diario de 'path' aún no volcadas al JSON, en orden:
+    {"add": [...]} o {"pop": n}. Una línea final incompleta (corte a mitad
+    de escritura) se ignora.
+    """
+    try:
+        with open(journal_path(path), "r", encoding="utf-8") as f:
+            lines = f.read().split("\n")
+    except FileNotFoundError:
+        return []
+    ops = []
+    for i, line in enumerate(lines):
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            break
+        if i == 0:
+            if entry.get("base") != _base_signature(path):
+                return []  # Diario de un JSON anterior, ya volcado
+        else:
+            ops.append(entry)
+    return ops
+
+
+def apply_journal(values, ops):
+    """Aplica las operaciones del diario sobre una lista de sorteos."""
+    values = list(values)
+    for op in ops:
+        if "add" in op:
+            values.extend(op["add"])
+        elif "pop" in op:
+            del values[max(len(values) - op["pop"], 0):]
+    return values
+
+
+def _journal_is_stale(path):
+    """True si el diario no existe o fue escrito sobre otra versión del JSON."""
+    try:
+        with open(journal_path(path), "r", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return True
+    return header.get("base") != _base_signature(path)
+
+
+def _append_journal(path, op):
+    jpath = journal_path(path)
+    if _journal_is_stale(path):
+        # Diario nuevo: empieza con la firma del JSON sobre el que se aplica
+        atomic_write(jpath, json.dumps({"base": _base_signature(path)}) + "\n")
+    with open(jpath, "r+b") as f:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(size - 1)
+        if f.read(1) != b"\n":
+            # Descartar una línea final incompleta antes de agregar
+            f.seek(0)
+            f.truncate(f.read().rfind(b"\n") + 1)
+            f.seek(0, os.SEEK_END)
+        f.write((json.dumps(op) + "\n").encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _load_json_file(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+def load_draws(path=JSON_FILE):
+    """
+    Historial completo tal como está en el JSON (int o str) con el diario aplicado.
+    Un JSON corrupto lanza json.JSONDecodeError en lugar de tratarse como vacío.
+    """
+    with file_lock(path):
+        return apply_journal(_load_json_file(path), read_journal(path))
+
+
+def read_tail(path, n):
+    """Últimos n sorteos con el diario aplicado, leyendo solo el final del JSON."""
+    if n <= 0:
+        return []
+    with file_lock(path):
+        ops = read_journal(path)
+        popped = sum(op.get("pop", 0) for op in ops)
+        base = read_json_tail(path, n + popped) if os.path.exists(path) else []
+        return apply_journal(base, ops)[-n:]
+
+
+def append_draws(draws, path=JSON_FILE):
+    """Agrega sorteos al historial escribiendo solo una línea en el diario."""
+    draws = list(draws)
+    if not draws:
+        return 0
+    with file_lock(path):
+        before = _source_signature(path)
+        _append_journal(path, {"add": draws})
+        _update_store(path, before, added=draws)
+        compact(path, min_bytes=COMPACT_BYTES)
+    return len(draws)
+
+
+def pop_draws(n=1, path=JSON_FILE):
+    """Quita los últimos n sorteos del historial y los retorna."""
+    with file_lock(path):
+        removed = read_tail(path, n)
+        if removed:
+            before = _source_signature(path)
+            _append_journal(path, {"pop": len(removed)})
+            _update_store(path, before, popped=len(_valid_bytes(removed)))
+            compact(path, min_bytes=COMPACT_BYTES)
+        return removed
+
+
+def compact(path=JSON_FILE, min_bytes=0):
+    """Vuelca el diario al JSON (escritura atómica) si pesa al menos 'min_bytes'."""
+    jpath = journal_path(path)
+    with file_lock(path):
+        if not os.path.exists(jpath) or os.path.getsize(jpath) < max(min_bytes, 1):
+            return False
+        before = _source_signature(path)
+        values = load_draws(path)
+        atomic_write(path, json.dumps(values, indent=4))
+        # Si esto no llega a ejecutarse, la firma del diario ya no coincide y se ignora
+        os.remove(jpath)
+        _update_store(path, before)
+    return True
+
+
+def store_path(path=JSON_FILE):
+    """Archivo binario que acompaña al JSON 'path' (loteka_numbers.json -> loteka_numbers.bin)."""
+    return os.path.splitext(path)[0] + STORE_SUFFIX
+
+
+def _source_signature(path):
+    """Identifica el estado del JSON junto con su diario (lo que refleja el archivo binario)."""
+    digest = hashlib.sha1(_base_signature(path).encode("utf-8"))
+    try:
+        with open(journal_path(path), "rb") as f:
+            digest.update(f.read())
+    except FileNotFoundError:
+        pass
+    return digest.digest()
+
+
+def _valid_bytes(values):
+    """Sorteos válidos de 'values' (int o str) como bytes; los demás se descartan, como en load_draw_array."""
+    parsed = (_parse_draw(str(x).encode("utf-8")) for x in values)
+    return bytes(v for v in parsed if v != INVALID)
+
+
+class DrawStore:
+    """
+    Archivo binario con un sorteo por byte después de la cabecera. La cantidad
+    de sorteos va en la cabecera: quitar los últimos solo la reescribe (los
+    bytes sobrantes se pisan al agregar), así el archivo nunca se achica bajo
+    un np.memmap abierto. Los datos se escriben antes que la cabecera; un corte
+    entre ambos deja una firma vieja y el archivo se reconstruye al cargarlo.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self.signature = None
+        try:
+            with open(path, "rb") as f:
+                header = f.read(HEADER_SIZE)
+                size = f.seek(0, os.SEEK_END)
+        except FileNotFoundError:
+            return
+        if len(header) == HEADER_SIZE:
+            magic, version, count, signature = HEADER.unpack(header)
+            if magic == MAGIC and version == STORE_VERSION and HEADER_SIZE + count <= size:
+                self.count, self.signature = count, signature
+
+    def __len__(self):
+        return self.count
+
+    def _write(self, offset, data, count, signature):
+        with open(self.path, "r+b" if os.path.exists(self.path) else "w+b") as f:
+            if data:
+                f.seek(HEADER_SIZE + offset)
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, STORE_VERSION, count, signature))
+            f.flush()
+            os.fsync(f.fileno())
+        self.count, self.signature = count, signature
+
+    def append(self, draws, signature):
+        """Agrega sorteos al final (O(1) por sorteo) y registra la nueva firma."""
+        data = _valid_bytes(draws)
+        self._write(self.count, data, self.count + len(data), signature)
+        return len(data)
+
+    def truncate_last(self, n, signature):
+        """Quita los últimos n sorteos reescribiendo solo la cabecera y los retorna."""
+        removed = self.tail(n)
+        self._write(self.count, b"", self.count - len(removed), signature)
+        return removed
+
+    def rebuild(self, values, signature):
+        """Reemplaza el contenido por 'values' (arreglo uint8 de sorteos válidos)."""
+        self._write(0, np.asarray(values, dtype=np.uint8).tobytes(), len(values), signature)
+
+    def tail(self, n):
+        """Últimos n sorteos como lista de enteros."""
+        n = min(n, self.count)
+        if n <= 0:
+            return []
+        with open(self.path, "rb") as f:
+            f.seek(HEADER_SIZE + self.count - n)
+            return list(f.read(n))
+
+    def array(self):
+        """
+        Historial completo como np.memmap uint8 de solo lectura, sin copiarlo.
+        La vista refleja el archivo: tras quitar y agregar sorteos, sus
+        últimas posiciones pueden cambiar; se copia si hay que conservarla.
+        """
+        if self.count == 0:
+            return np.zeros(0, dtype=np.uint8)
+        return np.memmap(self.path, dtype=np.uint8, mode="r", offset=HEADER_SIZE, shape=(self.count,))
+
+    @classmethod
+    def import_json(cls, json_path=JSON_FILE, path=None):
+        """Crea (o reemplaza) el archivo binario a partir del JSON y su diario."""
+        with file_lock(json_path):
+            store = cls(path or store_path(json_path))
+            store.rebuild(load_draw_array(json_path), _source_signature(json_path))
+        return store
+
+    def export_json(self, json_path=JSON_FILE):
+        """Escribe el historial en el formato JSON original (lista con indent=4)."""
+        with file_lock(json_path):
+            atomic_write(json_path, json.dumps(self.array().tolist(), indent=4))
+
+
+def _update_store(path, before, added=(), popped=0):
+    """
+    Aplica un cambio del historial al archivo binario, si estaba al día con la
+    firma 'before'. Si no existe o estaba desfasado no se toca: load_draw_store
+    lo reconstruye al cargarlo.
+    """
+    store = DrawStore(store_path(path))
+    if store.signature != before:
+        return
+    signature = _source_signature(path)
+    if popped:
+        store.truncate_last(popped, signature)
+    if added or not popped:
+        store.append(added, signature)
+
+
+def sync_store(path=JSON_FILE):
+    """DrawStore del JSON 'path', reconstruido si no refleja el JSON y su diario actuales."""
+    with file_lock(path):
+        store = DrawStore(store_path(path))
+        signature = _source_signature(path)
+        if store.signature != signature:
+            store.rebuild(load_draw_array(path), signature)
+        return store
+
+
+def load_draw_store(path=JSON_FILE):
+    """Historial válido como np.memmap uint8 sobre el archivo binario (ver DrawStore.array)."""
+    return sync_store(path).array()
+
+
+if __name__ == "__main__":
+    store = DrawStore.import_json(JSON_FILE)
+    print(f"{len(store)} sorteos importados de {JSON_FILE} a {store.path}")
+
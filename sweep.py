@@ -0,0 +1,158 @@
+#!c:/Users/LMiguelGJ/Desktop/LotePy/.venv/Scripts/python.exe
+"""
+Barrido de hiperparámetros de MarkovPredictor por precisión walk-forward.
+
+Evalúa la grilla (orden, ventana, weight_context, método) con el backtest
+vectorizado. Cada tarea (orden, ventana) corre en un pool de procesos que lee
+las paridades desde memoria compartida, así ningún proceso vuelve a cargar el
+JSON. Cada resultado se agrega a RESULTS_FILE apenas termina su tarea, de modo
+que un barrido interrumpido continúa donde quedó.
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from backtest import METHODS, method_probs
+from MarkovPY import load_history
+from storage import dataset_version
+
+ORDERS = [1, 2, 3, 4, 5, 6, 7, 8, 9]
+# None = todo el historial anterior (como NUMEROS_A_ANALIZAR = 0)
+WINDOWS = [None, 500, 1000, 5000, 20000]
+WEIGHTS = [0.5, 0.6, 0.7, 0.8, 0.9]
+RESULTS_FILE = 'sweep_results.jsonl'
+
+# Paridades compartidas, adjuntadas una vez por proceso
+_shared = None
+_bits = None
+
+
+def _attach(name, size):
+    global _shared, _bits
+    _shared = shared_memory.SharedMemory(name=name)
+    _bits = np.ndarray((size,), dtype=np.uint8, buffer=_shared.buf)
+
+
+def _row_key(row):
+    return (row['order'], row['window'], row['method'], row['weight_context'])
+
+
+def _task_rows(order, window, weights, methods):
+    """Claves de las filas que produce una tarea (orden, ventana)."""
+    keys = []
+    for method in methods:
+        for weight in (weights if method == 'weighted' else [None]):
+            keys.append((order, window, method, weight))
+    return keys
+
+
+def _evaluate(task):
+    """Evalúa todos los métodos y pesos de un par (orden, ventana)."""
+    order, window, weights, methods, start = task
+    bits = _bits.astype(np.int64)
+    probs = method_probs(bits, order, list(weights), window=window)
+    actual = bits[start:]
+    rows = []
+    for method in methods:
+        if method == 'weighted':
+            variants = zip(weights, probs['weighted'])
+        else:
+            variants = [(None, probs[method])]
+        for weight, (p_par, p_impar) in variants:
+            predicted = (p_impar > p_par)[start:]
+            hits = int((predicted == actual).sum())
+            rows.append({
+                'order': order,
+                'window': window,
+                'method': method,
+                'weight_context': weight,
+                'hits': hits,
+                'total': len(actual),
+                'hit_rate': hits / len(actual) if len(actual) else 0.0,
+            })
+    return rows
+
+
+def load_results(path, dataset, start):
+    """Filas ya calculadas para este historial y punto de inicio."""
+    rows = {}
+    if not os.path.exists(path):
+        return rows
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Línea incompleta de un barrido interrumpido
+            if row.get('dataset') == dataset and row.get('start') == start:
+                rows[_row_key(row)] = row
+    return rows
+
+
+def run_sweep(history, orders=ORDERS, windows=WINDOWS, weights=WEIGHTS, methods=METHODS,
+              results_file=RESULTS_FILE, workers=None):
+    """
+    Ejecuta (o retoma) el barrido y retorna las filas ordenadas por tasa de acierto.
+    Todas las combinaciones se puntúan sobre los mismos sorteos: desde la
+    ventana finita más grande de la grilla en adelante.
+    """
+    bits = (np.asarray(history, dtype=np.int64) % 2).astype(np.uint8)
+    dataset = dataset_version(history)
+    start = min(max([w for w in windows if w] or [0]), len(bits))
+
+    done = load_results(results_file, dataset, start)
+    tasks = [
+        (order, window, tuple(weights), tuple(methods), start)
+        for window in windows
+        for order in orders
+        if any(key not in done for key in _task_rows(order, window, weights, methods))
+    ]
+
+    if tasks:
+        shared = shared_memory.SharedMemory(create=True, size=max(len(bits), 1))
+        try:
+            np.ndarray((len(bits),), dtype=np.uint8, buffer=shared.buf)[:] = bits
+            with ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                                     initializer=_attach, initargs=(shared.name, len(bits))) as pool, \
+                    open(results_file, 'a', encoding='utf-8') as out:
+                futures = [pool.submit(_evaluate, task) for task in tasks]
+                for future in as_completed(futures):
+                    for row in future.result():
+                        if _row_key(row) in done:
+                            continue
+                        row.update(dataset=dataset, start=start)
+                        out.write(json.dumps(row) + '\n')
+                        done[_row_key(row)] = row
+                    out.flush()
+        finally:
+            shared.close()
+            shared.unlink()
+
+    wanted = {key for order in orders for window in windows
+              for key in _task_rows(order, window, weights, methods)}
+    rows = [row for key, row in done.items() if key in wanted]
+    return sorted(rows, key=lambda row: row['hit_rate'], reverse=True)
+
+
+def main():
+    """Run (or resume) the hyper-parameter sweep and print the ranking"""
+    print("🔎 Markov Hyper-Parameter Sweep")
+    history = load_history('loteka_numbers.json')
+    ranking = run_sweep(history)
+
+    print(f"\n{'='*20}")
+    print("🏆 TOP 20 COMBINATIONS")
+    print(f"{'='*20}")
+    for row in ranking[:20]:
+        window = row['window'] or 'all'
+        weight = f"w={row['weight_context']}" if row['weight_context'] is not None else ''
+        print(f"Order {row['order']} window {window:<6} {row['method']:<12} {weight:<6} {row['hit_rate']:.2%}")
+
+    print(f"\n✅ Sweep complete! ({len(ranking)} combinations)")
+
+
+if __name__ == "__main__":
+    main()
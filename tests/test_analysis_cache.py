@@ -0,0 +1,33 @@
+"""Límites de la caché compartida de análisis."""
+import numpy as np
+
+from analysis_cache import AnalysisCache, analysis_key, sizeof
+
+
+def test_sizeof_counts_array_buffers_once():
+    data = np.zeros(1000, dtype=np.float64)
+    assert sizeof({'a': data, 'b': data[-10:]}) < data.nbytes + 1000
+    assert sizeof([data[-1:]]) >= data.nbytes
+
+
+def test_evicts_by_bytes_and_skips_oversized_values():
+    cache = AnalysisCache(max_entries=16, max_bytes=30_000)
+    history = [1, 2, 3]
+    for name in 'abc':
+        cache.get_or_compute(analysis_key(history, name), lambda: np.zeros(1000))
+    assert len(cache) == 3
+    cache.get_or_compute(analysis_key(history, 'd'), lambda: np.zeros(1000))
+    assert len(cache) == 3 and analysis_key(history, 'a') not in cache
+    assert cache.total_bytes <= 30_000
+
+    value = cache.get_or_compute(analysis_key(history, 'big'), lambda: np.zeros(10_000))
+    assert len(value) == 10_000 and analysis_key(history, 'big') not in cache
+
+
+def test_new_dataset_version_drops_older_entries():
+    cache = AnalysisCache()
+    cache.get_or_compute(analysis_key([1, 2, 3], 'a'), lambda: 1)
+    cache.get_or_compute(analysis_key([1, 2, 3], 'b'), lambda: 2)
+    cache.get_or_compute(analysis_key([1, 2, 3, 4], 'a'), lambda: 3)
+    assert len(cache) == 1 and analysis_key([1, 2, 3, 4], 'a') in cache
+    assert cache.total_bytes == sizeof(3)
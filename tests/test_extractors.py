@@ -0,0 +1,41 @@
+"""Paridad de los extractores de HTML sobre páginas guardadas de getChanceExpress.php."""
+from pathlib import Path
+
+import pytest
+
+import extractors
+from extractors import extract_numbers, extract_numbers_bs4, extract_numbers_stream
+
+FIXTURES = sorted((Path(__file__).parent / 'fixtures' / 'chance_express').glob('*.html'))
+
+
+def read_fixture(path):
+    return path.read_text(encoding='utf-8')
+
+
+def test_fixtures_present():
+    assert len(FIXTURES) >= 3
+
+
+@pytest.mark.parametrize('path', FIXTURES, ids=lambda path: path.name)
+def test_stream_matches_bs4(path):
+    html = read_fixture(path)
+    assert extract_numbers_stream(html) == extract_numbers_bs4(html)
+
+
+@pytest.mark.parametrize('path', FIXTURES, ids=lambda path: path.name)
+def test_lxml_matches_bs4(path):
+    pytest.importorskip('lxml')
+    html = read_fixture(path)
+    assert extractors.extract_numbers_lxml(html) == extract_numbers_bs4(html)
+
+
+def test_expected_numbers():
+    html = read_fixture(FIXTURES[0])
+    assert extract_numbers_bs4(html) == ['47', '03', '90', '00', '18']
+    assert extract_numbers_stream(read_fixture(FIXTURES[1])) == []
+
+
+def test_unknown_extractor_raises():
+    with pytest.raises(ValueError, match='desconocido'):
+        extract_numbers(read_fixture(FIXTURES[0]), extractor='lmxl')
@@ -0,0 +1,38 @@
+"""El índice de frecuencias guardado con varios escritores a la vez."""
+import json
+import os
+import threading
+
+import numpy as np
+
+from frequency_index import FrequencyIndex, load_frequency_index, refresh_frequency_index, update_frequency_index
+from storage import append_draws, load_draw_array
+
+
+def test_concurrent_rebuilds_and_updates_leave_a_valid_index(tmp_path):
+    json_path = str(tmp_path / 'loteka_numbers.json')
+    path = str(tmp_path / 'loteka_freq.npz')
+    rng = np.random.default_rng(3)
+    with open(json_path, 'w') as f:
+        json.dump([f"{n:02d}" for n in rng.integers(0, 100, 50_000)], f)
+
+    def scrape():
+        for _ in range(5):
+            added = [f"{n:02d}" for n in rng.integers(0, 100, 10)]
+            append_draws(added, json_path)
+            update_frequency_index(added=added, json_path=json_path, path=path)
+
+    threads = [threading.Thread(target=refresh_frequency_index, args=(json_path, path)) for _ in range(4)]
+    threads.append(threading.Thread(target=scrape))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    index = load_frequency_index(path=path)
+    expected = FrequencyIndex().extend(load_draw_array(json_path))
+    assert index.draws.tolist() == expected.draws.tolist()
+    assert np.array_equal(index.counts, expected.counts)
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        ['loteka_numbers.json', 'loteka_numbers.json.journal', 'loteka_numbers.json.lock',
+         'loteka_numbers.bin', 'loteka_freq.npz'])
@@ -0,0 +1,135 @@
+"""El pipeline del scraper contra un servidor HTTP local con páginas de getChanceExpress.php fijas."""
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import scrapy
+from scrape_cache import ScrapeCache
+from storage import load_draws
+
+PAGE = """<div class="resultados-chance">
+  <h3>Resultados del {fecha}</h3>
+  <ul class="lista-sorteos">
+{items}
+  </ul>
+</div>
+"""
+ITEM = """    <li class="sorteo">
+      <span class="hora">{hora}:00 PM</span>
+      <div class="bolos"><span class="numero">{numero}</span><span class="numero">99</span></div>
+    </li>"""
+
+
+def render_page(fecha, numbers):
+    # La página lista primero el sorteo más reciente
+    items = [ITEM.format(hora=len(numbers) - i, numero=n) for i, n in enumerate(reversed(numbers))]
+    return PAGE.format(fecha=fecha, items='\n'.join(items))
+
+
+def fechas_hasta_hoy(dias):
+    hoy = datetime.now(scrapy.RD_TZ).replace(tzinfo=None)
+    return [(hoy - timedelta(days=d)).strftime('%d/%m/%Y') for d in range(dias, -1, -1)]
+
+
+@pytest.fixture
+def stub_server():
+    """Servidor con {fecha: números}; las primeras fechas responden más lento para desordenar las respuestas."""
+    pages = {}
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            fecha = parse_qs(urlparse(self.path).query)['fechaSeleccionada'][0]
+            requests_seen.append(fecha)
+            fechas = list(pages)
+            if fecha in fechas:
+                time.sleep(0.02 * (len(fechas) - fechas.index(fecha)))
+            body = render_page(fecha, pages.get(fecha, [])).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/getChanceExpress.php"
+    yield url, pages, requests_seen
+    server.shutdown()
+    server.server_close()
+
+
+def test_scrape_dates_keeps_date_order(stub_server):
+    url, pages, requests_seen = stub_server
+    fechas = [f"{d:02d}/01/2024" for d in range(1, 7)]
+    for i, fecha in enumerate(fechas):
+        pages[fecha] = [f"{(i * 7 + j) % 100:02d}" for j in range(3)]
+
+    shown = []
+    results = scrapy.scrape_dates(fechas, max_in_flight=4, rate_limit=0, base_url=url,
+                                  log=lambda *args: None, progress=lambda fecha, numeros: shown.append(fecha))
+
+    assert results == [pages[fecha] for fecha in fechas]
+    assert shown == fechas
+    assert sorted(requests_seen) == sorted(fechas)
+
+
+def test_main_appends_in_order_and_dedups(stub_server, tmp_path, monkeypatch):
+    url, pages, _ = stub_server
+    fechas = fechas_hasta_hoy(3)
+    for i, fecha in enumerate(fechas):
+        pages[fecha] = [f"{(i * 11 + j * 3) % 100:02d}" for j in range(4)]
+
+    # Historial que ya termina con los dos primeros sorteos del primer día
+    (tmp_path / 'loteka_numbers.json').write_text(json.dumps(['50', '51'] + pages[fechas[0]][:2], indent=4))
+    dotenv_path = tmp_path / '.env'
+    dotenv_path.write_text(f"LAST_PROCESSED_DATE='{fechas[0]}'\nLAST_PROCESSED_COUNT=2\n")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('LAST_PROCESSED_DATE', fechas[0])
+    monkeypatch.setenv('LAST_PROCESSED_COUNT', '2')
+    monkeypatch.setattr(scrapy, 'find_dotenv', lambda: str(dotenv_path))
+    monkeypatch.setattr(scrapy, 'BASE_URL', url)
+    monkeypatch.setattr(scrapy, 'ScrapeCache', lambda: ScrapeCache(str(tmp_path / 'cache.sqlite3')))
+
+    log = []
+    added = scrapy.main(log=lambda *args, **kwargs: log.append(' '.join(map(str, args))))
+
+    expected = pages[fechas[0]][2:] + [n for fecha in fechas[1:] for n in pages[fecha]]
+    assert added == expected
+    assert load_draws('loteka_numbers.json') == ['50', '51'] + pages[fechas[0]][:2] + expected
+    assert dotenv_path.read_text() == f"LAST_PROCESSED_DATE='{fechas[-1]}'\nLAST_PROCESSED_COUNT=4\n"
+    assert f"Resultados guardados. {len(expected)} nuevos numeros agregado." in log
+
+    # Una segunda corrida empieza en la última fecha procesada y no agrega nada
+    assert scrapy.main(log=lambda *args, **kwargs: None) == []
+    assert load_draws('loteka_numbers.json') == ['50', '51'] + pages[fechas[0]][:2] + expected
+
+
+def test_merge_does_not_drop_a_chance_match_with_the_previous_day():
+    # La corrida anterior fue antes del primer sorteo del día: nada de este día está guardado
+    stored = ['10', '42']
+    assert scrapy.merge_new_numbers(stored, [['42', '07', '13'], ['55']], already_stored=0) == ['42', '07', '13', '55']
+    # Sin conteo, un solapamiento corto no basta para descartar sorteos
+    day = ['42'] + [f"{n:02d}" for n in range(20)]
+    assert scrapy.merge_new_numbers(stored, [day]) == day
+
+
+def test_merge_skips_the_stored_part_of_the_first_day():
+    first_day = [f"{n:02d}" for n in range(12)]
+    stored = [3, 4] + [int(n) for n in first_day[:5]]
+    assert scrapy.merge_new_numbers(stored, [first_day, ['99']], already_stored=5) == first_day[5:] + ['99']
+    # Tras borrar el último número el conteo ya no coincide y se busca el solapamiento
+    assert scrapy.merge_new_numbers(stored[:-1], [first_day], already_stored=5) == first_day
+    long_overlap = [int(n) for n in first_day[:11]]
+    assert scrapy.merge_new_numbers(long_overlap, [first_day], already_stored=12) == first_day[11:]
+    # Una fecha con menos de MIN_OVERLAP sorteos cuenta si ya está completa
+    assert scrapy.merge_new_numbers([1, 2, 3], [['02', '03']]) == []
@@ -0,0 +1,65 @@
+"""El archivo binario de sorteos sigue al JSON y su diario."""
+import json
+import os
+import random
+import threading
+
+import numpy as np
+
+from storage import (
+    DrawStore, _source_signature, append_draws, atomic_write, compact, load_draw_array, load_draw_store,
+    pop_draws, store_path,
+)
+
+
+def test_store_follows_appends_pops_and_compaction(tmp_path):
+    path = str(tmp_path / 'loteka_numbers.json')
+    with open(path, 'w') as f:
+        json.dump(['07', 3, 'x', 99, 150], f, indent=4)
+    assert load_draw_store(path).tolist() == [7, 3, 99]
+
+    rng = random.Random(5)
+    for _ in range(300):
+        if rng.random() < 0.3:
+            pop_draws(rng.randint(1, 4), path)
+        else:
+            append_draws([rng.choice([f"{rng.randrange(100):02d}", rng.randrange(100), 'x'])
+                          for _ in range(rng.randint(1, 6))], path)
+        if rng.random() < 0.05:
+            compact(path)
+        # Al día sin reconstruir: la firma de la cabecera ya coincide
+        store = DrawStore(store_path(path))
+        assert store.signature == _source_signature(path)
+        assert store.array().tolist() == load_draw_array(path).tolist()
+
+    assert isinstance(load_draw_store(path), np.memmap)
+
+
+def test_store_rebuilds_when_json_changes_outside(tmp_path):
+    path = str(tmp_path / 'loteka_numbers.json')
+    with open(path, 'w') as f:
+        json.dump([1, 2, 3], f)
+    assert load_draw_store(path).tolist() == [1, 2, 3]
+
+    with open(path, 'w') as f:
+        json.dump([4, 5], f)
+    assert load_draw_store(path).tolist() == [4, 5]
+    assert DrawStore(store_path(path)).tail(1) == [5]
+
+    with open(store_path(path), 'r+b') as f:
+        f.write(b'corrupto')
+    assert load_draw_store(path).tolist() == [4, 5]
+
+
+def test_atomic_write_with_concurrent_writers(tmp_path):
+    path = str(tmp_path / 'data.bin')
+    payloads = [bytes([i]) * 200_000 for i in range(8)]
+    threads = [threading.Thread(target=atomic_write, args=(path, data)) for data in payloads]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with open(path, 'rb') as f:
+        assert f.read() in payloads
+    assert os.listdir(tmp_path) == ['data.bin']